@@ -0,0 +1,240 @@
+import os
+import numpy as np
+from joblib import Parallel, delayed
+from course_generator import CourseGenerator
+
+# Bump whenever the on-disk layout of a recommendation table changes
+RECOMMENDATION_TABLE_VERSION = 1
+
+# Score cut-offs between beginner/intermediate/advanced, as in CourseGenerator
+DIFFICULTY_BINS = [40, 60]
+
+
+def candidate_courses(course_database=None, difficulty_levels=None):
+    """
+    Every (subject, module, difficulty) a student can be recommended.
+
+    Returns a dict of equal-length arrays; a candidate's code is its position.
+    """
+    generator = CourseGenerator()
+    course_database = course_database or generator.course_database
+    difficulty_levels = difficulty_levels or generator.difficulty_levels
+
+    subjects, modules, module_orders, difficulties, complexities = [], [], [], [], []
+    for subject, course in course_database.items():
+        for order, module in enumerate(course['modules']):
+            for difficulty, level in difficulty_levels.items():
+                subjects.append(subject)
+                modules.append(module['title'])
+                module_orders.append(order)
+                difficulties.append(difficulty)
+                complexities.append(level['complexity'])
+
+    return {
+        'subject': np.array(subjects, dtype=str),
+        'module': np.array(modules, dtype=str),
+        'module_order': np.array(module_orders, dtype=np.int16),
+        'difficulty': np.array(difficulties, dtype=str),
+        'complexity': np.array(complexities, dtype=np.int8)
+    }
+
+
+def blend_scores(scores, has_score, predicted, prediction_weight):
+    """
+    Subject scores a recommendation is made on.
+
+    Observed scores are pulled towards the predictor's estimate by
+    prediction_weight (0 keeps them as observed, 1 uses the prediction
+    alone); unobserved subjects take the prediction.
+    """
+    blended = (1.0 - prediction_weight) * scores + prediction_weight * predicted
+    return np.where(has_score, blended, predicted)
+
+
+def score_block(subject_scores, subject_codes, complexities, module_orders, k):
+    """
+    Top-k candidate codes and utilities for a block of students.
+
+    A candidate's utility is how much room the student has in its subject
+    ((100 - score) / 100), scaled by how well its difficulty matches the
+    level that score calls for, with a small nudge towards earlier modules.
+    The block is (n_students x n_candidates), so its size bounds memory.
+    """
+    scores = subject_scores[:, subject_codes]
+    target = np.digitize(scores, DIFFICULTY_BINS) + 1
+    fit = 1.0 - np.abs(complexities - target) / 2.0
+    utility = (100.0 - scores) / 100.0 * fit - 0.01 * module_orders
+
+    # argpartition selects each row's top-k without sorting every candidate
+    top = np.argpartition(-utility, k - 1, axis=1)[:, :k]
+    rows = np.arange(len(utility))[:, None]
+    order = np.argsort(-utility[rows, top], axis=1, kind='stable')
+    top = top[rows, order]
+    return top.astype(np.int16), utility[rows, top].astype(np.float32)
+
+
+def _score_rows(scores, has_score, predicted, prediction_weight,
+                subject_codes, complexities, module_orders, k):
+    """score_block for one block of rating-matrix rows and their predicted scores"""
+    scores = scores.toarray().astype(np.float64)
+    if predicted is not None:
+        scores = blend_scores(scores, has_score.toarray() > 0, predicted, prediction_weight)
+    return score_block(scores, subject_codes, complexities, module_orders, k)
+
+
+def ranked_picks(candidates, codes, utilities):
+    """One student's top-k candidate codes as ranked recommendation dicts"""
+    return [{
+        'rank': rank,
+        'subject': str(candidates['subject'][code]),
+        'module': str(candidates['module'][code]),
+        'difficulty': str(candidates['difficulty'][code]).title(),
+        'utility': float(utility)
+    } for rank, (code, utility) in enumerate(zip(codes.tolist(), utilities.tolist()), 1)]
+
+
+class BatchRecommender:
+    """
+    Precomputes every student's top-k course modules in one offline pass.
+
+    Subject scores come from the observed ratings. With an optional
+    RatingPredictor (ItemItemCF, ALSFactorizer) unobserved subjects take its
+    prediction; observed ones are kept unless prediction_weight opts into
+    blending them with it. Without a predictor, unobserved subjects stay at 0
+    like the processed student matrix. Students are scored in blocks of
+    block_size across worker processes and the results written to a compact
+    .npz served by RecommendationTable.
+    """
+
+    def __init__(self, predictor=None, k=5, block_size=4096, n_jobs=-1, prediction_weight=0.0):
+        self.predictor = predictor
+        self.prediction_weight = prediction_weight
+        self.k = k
+        self.block_size = block_size
+        self.n_jobs = n_jobs
+        self.candidates = candidate_courses()
+        # Candidates actually scored by the last score_cohort() call
+        self.scored_candidates = None
+
+    def score_cohort(self, ratings):
+        """(student_ids, codes, utilities) of every student's top-k candidates"""
+        # Candidates for subjects missing from the ratings cannot be scored
+        item_codes = {item: j for j, item in enumerate(ratings.items)}
+        usable = np.array([subject in item_codes for subject in self.candidates['subject']])
+        candidates = {name: values[usable] for name, values in self.candidates.items()}
+        self.scored_candidates = candidates
+        subject_codes = np.array([item_codes[s] for s in candidates['subject']], dtype=np.int64)
+        k = min(self.k, len(subject_codes))
+
+        # Predictions are made here, a block at a time, so workers only get
+        # their block's sparse rows and dense predicted scores, never the
+        # predictor itself; the candidate expansion and top-k run there
+        observed = ratings.observed_mask()
+        blocks = [np.arange(start, min(start + self.block_size, ratings.shape[0]))
+                  for start in range(0, ratings.shape[0], self.block_size)]
+        parts = Parallel(n_jobs=self.n_jobs)(
+            delayed(_score_rows)(ratings.matrix[block], observed[block],
+                                 self._predict_block(block, ratings), self.prediction_weight,
+                                 subject_codes, candidates['complexity'],
+                                 candidates['module_order'], k)
+            for block in blocks)
+
+        if not parts:
+            return (np.empty(0, dtype=np.int64), np.empty((0, k), dtype=np.int16),
+                    np.empty((0, k), dtype=np.float32))
+        codes = np.vstack([part[0] for part in parts])
+        utilities = np.vstack([part[1] for part in parts])
+        return np.asarray(ratings.student_ids, dtype=np.int64), codes, utilities
+
+    def _predict_block(self, rows, ratings):
+        """Predicted scores for rows, with columns in ratings' item order"""
+        if self.predictor is None:
+            return None
+        predicted = self.predictor.predict_rows(rows)
+        if list(self.predictor.ratings.items) != list(ratings.items):
+            columns = [self.predictor.ratings.item_index[item] for item in ratings.items]
+            predicted = predicted[:, columns]
+        return predicted
+
+    def recommend_profile(self, scores, predicted=None):
+        """
+        Top-k for one {subject: score} profile outside the table, shaped like
+        RecommendationTable.lookup().
+
+        predicted ({subject: score}, e.g. ALSFactorizer.predict_profile) is
+        blended in exactly as the predictor's rows are for the cohort.
+        """
+        predicted = predicted or {}
+        subjects = sorted(set(scores) | set(predicted))
+        usable = np.isin(self.candidates['subject'], subjects)
+        candidates = {name: values[usable] for name, values in self.candidates.items()}
+        subject_codes = np.searchsorted(subjects, candidates['subject'])
+        k = min(self.k, len(subject_codes))
+        if k == 0:
+            return []
+
+        profile = np.array([[scores.get(s, 0.0) for s in subjects]], dtype=np.float64)
+        if predicted:
+            has_score = np.array([[s in scores for s in subjects]])
+            estimate = np.array([[predicted.get(s, scores.get(s, 0.0)) for s in subjects]],
+                                dtype=np.float64)
+            profile = blend_scores(profile, has_score, estimate, self.prediction_weight)
+        codes, utilities = score_block(profile, subject_codes, candidates['complexity'],
+                                       candidates['module_order'], k)
+        return ranked_picks(candidates, codes[0], utilities[0])
+
+    def run(self, ratings, path):
+        """Score the whole cohort and write the table to path"""
+        student_ids, codes, utilities = self.score_cohort(ratings)
+        order = np.argsort(student_ids, kind='stable')
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        np.savez(path,
+                 version=np.array(RECOMMENDATION_TABLE_VERSION),
+                 student_ids=student_ids[order],
+                 codes=codes[order],
+                 utilities=utilities[order],
+                 **{f"candidate_{name}": values for name, values in self.scored_candidates.items()})
+        print(f"Top-{codes.shape[1]} recommendations for {len(student_ids)} students "
+              f"written to {path}")
+        return path
+
+
+class RecommendationTable:
+    """
+    Read side of a BatchRecommender run: per-student lookups, no scoring.
+
+    student_ids is sorted, so a lookup is a binary search plus a row read.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with np.load(path, allow_pickle=False) as table:
+            if int(table['version']) != RECOMMENDATION_TABLE_VERSION:
+                raise ValueError(f"Unsupported recommendation table version in {path}: "
+                                 f"{int(table['version'])}")
+            self.student_ids = table['student_ids']
+            self.codes = table['codes']
+            self.utilities = table['utilities']
+            self.candidates = {name[len('candidate_'):]: table[name]
+                               for name in table.files if name.startswith('candidate_')}
+
+    def __len__(self):
+        return len(self.student_ids)
+
+    def __contains__(self, student_id):
+        return self.position(student_id) is not None
+
+    def position(self, student_id):
+        """Row position of student_id, or None if absent"""
+        i = int(np.searchsorted(self.student_ids, student_id))
+        if i < len(self.student_ids) and self.student_ids[i] == student_id:
+            return i
+        return None
+
+    def lookup(self, student_id):
+        """A student's ranked recommendations as dicts, or None if not in the table"""
+        i = self.position(student_id)
+        if i is None:
+            return None
+        return ranked_picks(self.candidates, self.codes[i], self.utilities[i])
@@ -0,0 +1,133 @@
+import json
+import os
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+from course_generator import CourseGenerator, NumpyEncoder
+from model_artifact import data_fingerprint
+
+# Bump whenever the saved cluster/bundle layout changes
+COHORT_CLUSTERS_VERSION = 1
+
+
+class CohortClusters:
+    """
+    Students grouped by their subject-score vectors, with one precomputed
+    recommendation bundle per cluster.
+
+    Clusters come from mini-batch k-means over processed_data. Each bundle
+    holds the centroid scores, the performance tier predicted for the
+    cluster's mean features, and a CourseGenerator course per subject at
+    the centroid score. Serving a student is then a nearest-centroid search
+    (O(n_clusters * n_subjects)) and a dict lookup, instead of model
+    inference and course generation per request.
+
+    data_version fingerprints the processed_data the clusters were fitted
+    on and model_version identifies the tier model behind the bundles, so a
+    saved copy can be checked against the current data and model.
+    """
+
+    def __init__(self, n_clusters=8, batch_size=256, max_iter=100, seed=42):
+        self.n_clusters = n_clusters
+        self.batch_size = batch_size
+        self.max_iter = max_iter
+        self.seed = seed
+        self.subjects = None
+        self.centroids = None
+        self.fill_scores = None
+        self.bundles = []
+        self.data_version = None
+        self.model_version = None
+
+    def fit(self, processed_data, predict_tier=None, model_version=None):
+        """
+        Cluster processed_data and build every cluster's bundle.
+
+        predict_tier maps a one-row feature DataFrame to a tier label
+        (e.g. ModelTrainer.predict_performance); without it a bundle's tier
+        is the most common observed tier among its members. model_version
+        (e.g. the model artifact's trained_at) is saved with the clusters.
+        """
+        self.data_version = data_fingerprint(processed_data)
+        self.model_version = model_version
+        self.subjects = [col for col in processed_data.columns
+                         if col not in ['average_score', 'performance_tier', 'time_spent']]
+        scores = processed_data[self.subjects].to_numpy(dtype=np.float64)
+        n_clusters = min(self.n_clusters, len(scores))
+
+        kmeans = MiniBatchKMeans(n_clusters=n_clusters, batch_size=self.batch_size,
+                                 max_iter=self.max_iter, random_state=self.seed, n_init=3)
+        labels = kmeans.fit_predict(scores)
+        self.centroids = kmeans.cluster_centers_
+        # Subjects missing from an incoming profile are taken at the cohort mean
+        self.fill_scores = scores.mean(axis=0)
+
+        generator = CourseGenerator()
+        features = processed_data.drop(columns='performance_tier')
+        self.bundles = []
+        for cluster in range(n_clusters):
+            members = labels == cluster
+            mean_features = features[members].mean().to_frame().T
+            if predict_tier is not None:
+                tier = str(predict_tier(mean_features)[0])
+            else:
+                tier = str(processed_data.loc[members, 'performance_tier'].mode().iloc[0])
+
+            centroid = dict(zip(self.subjects, self.centroids[cluster].round(1).tolist()))
+            self.bundles.append({
+                'cluster': cluster,
+                'size': int(members.sum()),
+                'centroid': centroid,
+                'predicted_tier': tier,
+                # Weakest subject first, as the course recommender orders them
+                'courses': {subject: generator.generate_course(subject, score)
+                            for subject, score in sorted(centroid.items(), key=lambda item: item[1])}
+            })
+
+        print(f"Clustered {len(scores)} students into {n_clusters} cohorts")
+        return self
+
+    def assign(self, scores):
+        """Index of the nearest centroid to a {subject: score} profile"""
+        vector = np.array([scores.get(subject, fill) for subject, fill in zip(self.subjects, self.fill_scores)],
+                          dtype=np.float64)
+        return int(np.argmin(((self.centroids - vector) ** 2).sum(axis=1)))
+
+    def bundle_for(self, scores):
+        """The precomputed bundle of the cohort a profile belongs to"""
+        return self.bundles[self.assign(scores)]
+
+    def save(self, path):
+        """Persist centroids and bundles as JSON"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        state = {
+            'version': COHORT_CLUSTERS_VERSION,
+            'params': {'n_clusters': self.n_clusters, 'batch_size': self.batch_size,
+                       'max_iter': self.max_iter, 'seed': self.seed},
+            'subjects': self.subjects,
+            'centroids': self.centroids,
+            'fill_scores': self.fill_scores,
+            'bundles': self.bundles,
+            'data_version': self.data_version,
+            'model_version': self.model_version
+        }
+        with open(path, 'w') as f:
+            json.dump(state, f, cls=NumpyEncoder)
+        print(f"Cohort clusters saved to {path}")
+        return path
+
+    @classmethod
+    def load(cls, path):
+        """Load clusters saved with save(); no refit needed"""
+        with open(path) as f:
+            state = json.load(f)
+        if state.get('version') != COHORT_CLUSTERS_VERSION:
+            raise ValueError(f"Unsupported cohort cluster version in {path}: {state.get('version')}")
+        clusters = cls(**state['params'])
+        clusters.subjects = state['subjects']
+        clusters.centroids = np.array(state['centroids'], dtype=np.float64)
+        clusters.fill_scores = np.array(state['fill_scores'], dtype=np.float64)
+        clusters.bundles = state['bundles']
+        # Absent from files saved before versions were recorded; treated as stale
+        clusters.data_version = state.get('data_version')
+        clusters.model_version = state.get('model_version')
+        return clusters
@@ -0,0 +1,288 @@
+import hashlib
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from neighbor_index import LSHIndex
+from similarity_cache import ratings_fingerprint
+from knn_graph import build_knn_graph
+
+
+class RatingPredictor:
+    """
+    Shared ranking helpers for engines that predict scores for RatingMatrix rows.
+
+    Subclasses set self.ratings and self.observed in fit() and implement
+    predict_rows(rows) returning a dense (len(rows) x n_items) score block.
+    """
+
+    block_size = 4096
+
+    def predict_rows(self, rows):
+        raise NotImplementedError
+
+    def predict_student(self, student_id, include_observed=False):
+        """{item: predicted score} for one student's unobserved items"""
+        row = self.ratings.student_index.get(student_id)
+        if row is None:
+            return {}
+        predictions = self.predict_rows(np.array([row]))[0]
+        observed = set(self.ratings.matrix.indices[
+            self.ratings.matrix.indptr[row]:self.ratings.matrix.indptr[row + 1]].tolist())
+        return {item: float(score) for j, (item, score) in enumerate(zip(self.ratings.items, predictions))
+                if include_observed or j not in observed}
+
+    def recommend(self, student_ids=None, n=5, exclude_observed=True, ascending=True):
+        """
+        Ranked (student_id, item, predicted_score, rank) rows for many students.
+
+        By default items the student is predicted to score lowest on come
+        first, since those are the subjects the course recommender targets.
+        Students are scored in blocks of block_size rows.
+        """
+        if student_ids is None:
+            rows = np.arange(self.ratings.shape[0])
+        else:
+            rows = self.ratings.rows_for(student_ids)
+        n = min(n, self.ratings.shape[1])
+
+        frames = []
+        for start in range(0, len(rows), self.block_size):
+            block = rows[start:start + self.block_size]
+            scores = self.predict_rows(block)
+            # Rank key: lowest predicted score first unless ascending=False
+            keys = scores if ascending else -scores
+            if exclude_observed:
+                keys = np.where(self.observed[block].toarray() > 0, np.inf, keys)
+
+            top = np.argsort(keys, axis=1, kind='stable')[:, :n]
+            block_rows = np.arange(len(block))[:, None]
+            valid = np.isfinite(keys[block_rows, top])
+            frames.append(pd.DataFrame({
+                'student_id': np.repeat(self.ratings.student_ids[block], n)[valid.ravel()],
+                'item': self.ratings.items[top].ravel()[valid.ravel()],
+                'predicted_score': scores[block_rows, top].ravel()[valid.ravel()],
+                'rank': np.tile(np.arange(1, n + 1), len(block))[valid.ravel()]
+            }))
+
+        if not frames:
+            return pd.DataFrame(columns=['student_id', 'item', 'predicted_score', 'rank'])
+        return pd.concat(frames, ignore_index=True)
+
+
+class ItemItemCF(RatingPredictor):
+    """
+    Item-item collaborative filtering over a RatingMatrix.
+
+    The item similarity matrix comes from one sparse product of the (optionally
+    mean-centred) rating matrix with its transpose, pruned to each item's k
+    nearest neighbours. Unseen scores are predicted for whole blocks of
+    students at once as a neighbour-weighted average of their observed scores.
+    """
+
+    def __init__(self, k=20, similarity='adjusted_cosine', shrinkage=0.0, block_size=4096):
+        if similarity not in ('cosine', 'adjusted_cosine'):
+            raise ValueError(f"Unknown similarity: {similarity}")
+        self.k = k
+        self.similarity = similarity
+        # Pulls similarities built on few co-rated students towards 0
+        self.shrinkage = shrinkage
+        self.block_size = block_size
+        self.ratings = None
+        self.item_similarity = None
+        self.student_means = None
+        self.centred = None
+        self.observed = None
+        self._weights = None
+
+    def fit(self, ratings):
+        """Compute the pruned item-item similarity matrix from a RatingMatrix"""
+        self.ratings = ratings
+        matrix = ratings.matrix.astype(np.float64)
+        mask = ratings.observed_mask()
+        self.observed = mask
+
+        counts = ratings.observed_counts(axis=1)
+        sums = np.asarray(matrix.sum(axis=1)).ravel()
+        self.student_means = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+
+        if self.similarity == 'adjusted_cosine':
+            # Subtract each student's mean from their observed entries only
+            centred = matrix.copy()
+            centred.data -= np.repeat(self.student_means, np.diff(centred.indptr))
+            self.centred = centred
+        else:
+            self.centred = matrix
+
+        # Cosine similarity of item columns in one sparse product
+        gram = (self.centred.T @ self.centred).toarray()
+        norms = np.sqrt(np.diag(gram))
+        denom = np.outer(norms, norms)
+        similarity = np.divide(gram, denom, out=np.zeros_like(gram), where=denom > 0)
+
+        if self.shrinkage > 0:
+            co_rated = (mask.T @ mask).toarray()
+            similarity *= co_rated / (co_rated + self.shrinkage)
+
+        np.fill_diagonal(similarity, 0.0)
+        self.item_similarity = self._prune_top_k(similarity, self.k)
+        # Prediction for item i weighs observed item j by sim(i, j); only
+        # positive neighbours contribute, as is usual for neighbourhood CF
+        self._weights = self.item_similarity.maximum(0).T.tocsr()
+        print(f"Item-item CF fitted on {ratings.shape[0]} students x {ratings.shape[1]} items")
+        return self
+
+    @staticmethod
+    def _prune_top_k(similarity, k):
+        """Keep each item's k most similar neighbours as a CSR matrix"""
+        n_items = similarity.shape[0]
+        if k >= n_items - 1:
+            return sparse.csr_matrix(similarity)
+
+        # argpartition selects the top-k per row without a full sort
+        top = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+        rows = np.repeat(np.arange(n_items), k)
+        values = similarity[rows, top.ravel()]
+        return sparse.csr_matrix((values, (rows, top.ravel())), shape=similarity.shape)
+
+    def predict_rows(self, rows):
+        """Dense predicted scores (len(rows) x n_items) for rating-matrix row positions"""
+        numerator = (self.centred[rows] @ self._weights).toarray()
+        denominator = (self.observed[rows] @ self._weights).toarray()
+        has_support = denominator > 0
+        offset = np.divide(numerator, denominator, out=np.zeros_like(numerator), where=has_support)
+
+        # Without any similar observed item, fall back to the student's mean
+        if self.similarity == 'adjusted_cosine':
+            predictions = self.student_means[rows][:, None] + offset
+        else:
+            predictions = np.where(has_support, offset, self.student_means[rows][:, None])
+        return np.clip(predictions, 0, 100)
+
+
+class UserUserCF:
+    """
+    "Students like you" collaborative filtering over an approximate kNN index.
+
+    Each student is represented by their subject scores centred on the cohort
+    means (unobserved subjects sit at the mean). Neighbours come from an
+    LSHIndex, so a query touches a few buckets instead of the whole cohort,
+    and a score is predicted as the student's mean plus the similarity-weighted
+    deviations of the neighbours who have a result in that subject.
+
+    With a SimilarityCache, neighbour rows for ids and for repeated profiles
+    are served from the cache instead of re-querying the index. Profile rows
+    stay in its memory tier: free-form profiles are too many to keep on disk.
+    """
+
+    def __init__(self, k=20, n_tables=8, n_bits=12, n_probes=2, seed=42, cache=None):
+        self.k = k
+        self.cache = cache
+        self.index_params = {'n_tables': n_tables, 'n_bits': n_bits,
+                             'n_probes': n_probes, 'seed': seed}
+        self.ratings = None
+        self.index = None
+        self.item_means = None
+        self.items = None
+
+    def fit(self, ratings):
+        """Index every student in a RatingMatrix"""
+        self.ratings = ratings
+        self.items = list(ratings.items)
+        dense = ratings.to_dense().to_numpy()
+        self.item_means = np.nanmean(dense, axis=0)
+
+        # Per-student deviations, reused as neighbour evidence at predict time
+        self.student_means = np.nanmean(dense, axis=1)
+        self.deviations = dense - self.student_means[:, None]
+
+        self.index = LSHIndex(len(self.items), **self.index_params)
+        self.index.add(self._vectors(dense), ratings.student_ids).flush()
+        if self.cache is not None:
+            self.cache.set_version(ratings_fingerprint(ratings))
+        print(f"User-user CF index built over {len(self.index)} students")
+        return self
+
+    def _vectors(self, dense):
+        """Index vectors: scores centred on cohort means, unobserved at 0"""
+        return np.nan_to_num(dense - self.item_means, nan=0.0)
+
+    def add_students(self, student_ids, scores):
+        """Insert new students ({subject: score} dicts) without rebuilding the index"""
+        dense = np.array([[profile.get(item, np.nan) for item in self.items] for profile in scores],
+                         dtype=np.float64)
+        self.index.add(self._vectors(dense), student_ids)
+        means = np.nanmean(dense, axis=1)
+        self.student_means = np.concatenate([self.student_means, means])
+        self.deviations = np.vstack([self.deviations, dense - means[:, None]])
+        if self.cache is not None:
+            # New students can displace anyone's cached neighbours
+            self.cache.invalidate()
+        return self
+
+    def neighbours(self, student_id=None, scores=None, k=None):
+        """(student_ids, similarities) of the nearest students to an id or a profile"""
+        k = k or self.k
+        if scores is not None:
+            vector = self._vectors(self._profile_row(scores)[None, :])[0]
+            key = f"profile_{hashlib.sha1(vector.tobytes()).hexdigest()[:16]}_k{k}"
+            return self._cached(key, lambda: self.index.query(vector, k=k), persist=False)
+        vector = self.index.vector_for(student_id)
+        if vector is None:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        return self._cached(f"student_{student_id}_k{k}",
+                            lambda: self.index.query(vector, k=k, exclude_id=student_id))
+
+    def _cached(self, key, query, persist=True):
+        if self.cache is None:
+            return query()
+        return self.cache.get(key, query, persist=persist)
+
+    def write_knn_graph(self, path, k=None, max_memory_bytes=256 * 1024 * 1024, n_jobs=-1):
+        """Exact neighbours of every indexed student, computed in bounded-memory tiles"""
+        return build_knn_graph(self.index.vectors, self.index.ids, path, k=k or self.k,
+                               max_memory_bytes=max_memory_bytes, n_jobs=n_jobs)
+
+    def _profile_row(self, scores):
+        return np.array([scores.get(item, np.nan) for item in self.items], dtype=np.float64)
+
+    def _predict(self, own_scores, neighbour_ids, similarities):
+        positions = np.array([self.index.position(sid) for sid in neighbour_ids.tolist()],
+                             dtype=np.int64)
+        weights = np.maximum(similarities, 0)[:, None]
+        deviations = self.deviations[positions]
+        has_score = ~np.isnan(deviations)
+
+        numerator = (np.nan_to_num(deviations) * weights).sum(axis=0)
+        denominator = (has_score * weights).sum(axis=0)
+        offset = np.divide(numerator, denominator, out=np.zeros_like(numerator),
+                           where=denominator > 0)
+        own_mean = np.nanmean(own_scores) if not np.isnan(own_scores).all() else np.nanmean(self.item_means)
+        return np.clip(own_mean + offset, 0, 100)
+
+    def predict_student(self, student_id, include_observed=False):
+        """{item: predicted score} for an indexed student's unobserved items"""
+        position = self.index.position(student_id)
+        if position is None:
+            return {}
+        neighbour_ids, similarities = self.neighbours(student_id)
+        own = self.deviations[position] + self.student_means[position]
+        predictions = self._predict(own, neighbour_ids, similarities)
+        return {item: float(score) for item, score, seen in zip(self.items, predictions, ~np.isnan(own))
+                if include_observed or not seen}
+
+    def predict_rows(self, rows):
+        """Dense predicted scores (len(rows) x n_items) for rating-matrix row positions, one query each"""
+        predictions = np.empty((len(rows), len(self.items)))
+        for i, student_id in enumerate(self.ratings.student_ids[rows].tolist()):
+            position = self.index.position(student_id)
+            neighbour_ids, similarities = self.neighbours(student_id)
+            own = self.deviations[position] + self.student_means[position]
+            predictions[i] = self._predict(own, neighbour_ids, similarities)
+        return predictions
+
+    def predict_profile(self, scores):
+        """Peer-based predicted score for every item, for a profile not in the index"""
+        own = self._profile_row(scores)
+        neighbour_ids, similarities = self.neighbours(scores=scores)
+        predictions = self._predict(own, neighbour_ids, similarities)
+        return dict(zip(self.items, predictions.tolist()))
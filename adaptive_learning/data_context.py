@@ -0,0 +1,107 @@
+import os
+from data_processor import DataProcessor
+from feature_store import FeatureStore
+from student_index import StudentIndex
+
+# One context per dataset path, shared by every stage in the process
+_SHARED_CONTEXTS = {}
+
+
+class DataContext:
+    """
+    Loads and preprocesses a dataset once and shares it across pipeline stages.
+
+    Derived views (features, labels, feature columns, train/test splits) are
+    computed lazily on first use and cached until invalidate() is called.
+    """
+
+    def __init__(self, file_path, processor=None):
+        self.file_path = file_path
+        self.processor = processor or DataProcessor(file_path, ingested_path=self.ingested_path)
+        self._views = {}
+
+    @classmethod
+    def shared(cls, file_path):
+        """Return the process-wide context for file_path, creating it if needed"""
+        key = os.path.abspath(file_path)
+        if key not in _SHARED_CONTEXTS:
+            _SHARED_CONTEXTS[key] = cls(file_path)
+        return _SHARED_CONTEXTS[key]
+
+    @property
+    def df(self):
+        """Cleaned test results"""
+        if self.processor.df is None:
+            self.processor.load_data()
+        return self.processor.df_clean
+
+    @property
+    def processed_data(self):
+        """Student matrix, preprocessed once"""
+        if self.processor.processed_data is None:
+            self.processor.preprocess_data()
+        return self.processor.processed_data
+
+    @property
+    def student_index(self):
+        """Per-student lookup snapshot, rebuilt whenever the processor's data changes"""
+        processed_data = self.processed_data
+        index = self._views.get('student_index')
+        if index is None or index.version != self.processor.data_version:
+            index = StudentIndex(processed_data, version=self.processor.data_version)
+            self._views['student_index'] = index
+        return index
+
+    def _view(self, key, build):
+        if key not in self._views:
+            self._views[key] = build()
+        return self._views[key]
+
+    def features_and_labels(self, sparse_features=False):
+        """Cached (X, y) from DataProcessor.get_features_and_labels"""
+        return self._view(
+            ('features', sparse_features),
+            lambda: self.processor.get_features_and_labels(sparse_features=sparse_features))
+
+    @property
+    def feature_columns(self):
+        """Feature column names in training order"""
+        return self._view(
+            'feature_columns',
+            lambda: list(self.processed_data.columns.drop('performance_tier')))
+
+    def split_data(self, test_size=0.2, random_state=42, sparse_features=False):
+        """Cached train/test split; repeated calls with the same arguments are free"""
+        return self._view(
+            ('split', test_size, random_state, sparse_features),
+            lambda: self.processor.split_data(test_size=test_size, random_state=random_state,
+                                              sparse_features=sparse_features))
+
+    @property
+    def ingested_path(self):
+        """Results added after the export (e.g. retrained app profiles), next to the dataset"""
+        return os.path.join(os.path.dirname(os.path.abspath(self.file_path)), 'ingested', 'results.csv')
+
+    @property
+    def feature_store_path(self):
+        """Default feature store location, next to the dataset"""
+        return os.path.join(os.path.dirname(os.path.abspath(self.file_path)), 'feature_store')
+
+    def write_feature_store(self, path=None):
+        """Persist processed_data as a memory-mapped FeatureStore"""
+        return FeatureStore.write(self.processed_data, path or self.feature_store_path,
+                                  ratings=self.processor.get_rating_matrix())
+
+    def update_scores(self, new_results, persist=True):
+        """Fold new results into the shared data and drop stale views"""
+        processed_data = self.processor.update_scores(new_results, persist=persist)
+        self.invalidate()
+        return processed_data
+
+    def invalidate(self):
+        """Forget all derived views; the next access recomputes them"""
+        self._views.clear()
+
+    @property
+    def csv_parses(self):
+        return self.processor.csv_parses
@@ -2,40 +2,512 @@ import pandas as pd
 import numpy as np
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.model_selection import train_test_split
+from scipy import sparse
+from joblib import Parallel, delayed, effective_n_jobs
+import glob
+import hashlib
+import itertools
+import json
 import os
+from rating_matrix import RatingMatrix
+from result_store import ResultStore
+
+# Bump whenever the layout of the cached columnar bundle changes
+CACHE_FORMAT_VERSION = 4
+
+# Columns kept from the raw export. best_subject and average_score are
+# per-student values repeated on every row and are recomputed anyway.
+RAW_COLUMNS = ['student_id', 'subject', 'test_number', 'score']
+
+# Compact in-memory schema for the cleaned test results. test_number is read
+# as text because the export mixes per-subject 'Average' rows into it.
+READ_DTYPES = {'student_id': 'int32', 'subject': 'category', 'test_number': str}
+COMPACT_SCHEMA = {'student_id': 'int32', 'test_number': 'uint8', 'score': 'uint8'}
+
+def partition_values(path):
+    """Hive-style key=value partition values from a path, e.g. school=A/term=2024-1"""
+    values = {}
+    for part in os.path.normpath(path).split(os.sep):
+        part = os.path.splitext(part)[0] if part.endswith('.csv') else part
+        if '=' in part:
+            key, value = part.split('=', 1)
+            values[key] = value
+    return values
+
+def aggregate_results(df):
+    """Per-(student, subject) score sums/counts and per-student test_number sums"""
+    grouped = df.groupby(['student_id', 'subject'], observed=True)['score']
+    # Widen test numbers first so uint8 inputs cannot overflow
+    test_sum = df['test_number'].astype('int64').groupby(df['student_id']).sum()
+    return grouped.sum(), grouped.count(), test_sum
 
 class DataProcessor:
-    def __init__(self, file_path):
+    def __init__(self, file_path, use_cache=True, cache_dir=None,
+                 partition_filters=None, n_read_jobs=-1, db_path=None, ingested_path=None):
+        # file_path may be a single CSV, a directory of partitioned CSVs or a glob
         self.file_path = file_path
+        # Optional SQLite result store; file_path then only seeds an empty database
+        self.db_path = db_path
+        self._result_store = None
+        # Optional CSV of results added after the export (see update_scores);
+        # merged into every load. Unused with db_path, where the store holds them.
+        self.ingested_path = ingested_path
+        self.use_cache = use_cache
+        # e.g. {'school': ['north'], 'term': ['2024-1']}; prunes files before reading
+        self.partition_filters = partition_filters or {}
+        self.n_read_jobs = n_read_jobs
+        # Columnar cache lives next to the data unless told otherwise
+        self.cache_dir = cache_dir or os.path.join(self._base_dir(), 'cache')
         self.df = None
         self.processed_data = None
+        self.rating_matrix = None
+        # Bumped whenever processed_data changes, so snapshots can detect staleness
+        self.data_version = 0
+        # Number of times the source CSV has been parsed by this processor
+        self.csv_parses = 0
         
     def load_data(self):
         """Load and preprocess the dataset"""
-        print(f"Loading data from {self.file_path}")
-        self.df = pd.read_csv(self.file_path)
+        if self.db_path is not None:
+            self.df = self._clean_frame(self.get_result_store().read_results())
+            self.df_clean = self.df
+            print(f"Data loaded from {self.db_path} with {len(self.df_clean)} records")
+            return self.df_clean
+        
+        if self.use_cache:
+            cached = self._load_cache()
+            if cached is not None:
+                # The raw frame (with 'Average' rows) is not cached
+                self.df = cached
+                self.df_clean = self._with_ingested(cached)
+                print(f"Data loaded from cache with {len(self.df_clean)} records")
+                return self.df_clean
+        
+        files = self._source_files()
+        print(f"Loading data from {self.file_path} ({len(files)} file(s))")
+        if len(files) == 1:
+            self.df = self._read_csv(files[0])
+        else:
+            # Parsing is mostly in C and releases the GIL, so threads suffice
+            frames = Parallel(n_jobs=self.n_read_jobs, prefer='threads')(
+                delayed(self._read_csv)(path) for path in files)
+            self.df = pd.concat(frames, ignore_index=True)
+        self.df_clean = self._clean_frame(self.df)
+        
+        print(f"Data loaded successfully with {len(self.df_clean)} records")
+        raw_mb = self._default_footprint(self.df) / 2**20
+        clean_mb = self.df_clean.memory_usage(deep=True).sum() / 2**20
+        print(f"Memory footprint: {raw_mb:.2f} MB raw -> {clean_mb:.2f} MB compact")
+        
+        if self.use_cache:
+            self._write_cache(self.df_clean)
+        self.df_clean = self._with_ingested(self.df_clean)
+        return self.df_clean
+    
+    def _read_ingested(self, **kwargs):
+        """Raw rows of the ingested-results CSV, or None if there are none"""
+        if self.db_path is not None or self.ingested_path is None or not os.path.exists(self.ingested_path):
+            return None
+        return pd.read_csv(self.ingested_path, usecols=RAW_COLUMNS, dtype=READ_DTYPES, **kwargs)
+    
+    def _with_ingested(self, df_clean):
+        """df_clean with the ingested results appended"""
+        ingested = self._read_ingested()
+        if ingested is None or ingested.empty:
+            return df_clean
+        print(f"Merging {len(ingested)} ingested results from {self.ingested_path}")
+        return self._clean_frame(pd.concat([df_clean, ingested], ignore_index=True))
+    
+    def persist_results(self, new_results):
+        """Durably record results already folded in with update_scores(persist=False)"""
+        delta = self._clean_frame(new_results[RAW_COLUMNS])
+        if delta.empty:
+            return 0
+        if self.db_path is not None:
+            self.get_result_store().insert_results(delta)
+        elif self.ingested_path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.ingested_path)), exist_ok=True)
+            delta[RAW_COLUMNS].to_csv(self.ingested_path, mode='a', index=False,
+                                      header=not os.path.exists(self.ingested_path))
+        return len(delta)
+    
+    def _base_dir(self):
+        """Directory holding the source: the CSV's folder, or a glob's fixed prefix"""
+        # A database-only processor has no file_path; anchor on the database
+        path = os.path.abspath(self.file_path if self.file_path is not None else self.db_path)
+        if glob.has_magic(path):
+            parts = path.split(os.sep)
+            first_magic = next(i for i, p in enumerate(parts) if glob.has_magic(p))
+            return os.sep.join(parts[:first_magic]) or os.sep
+        return os.path.dirname(path)
+    
+    def _source_files(self):
+        """CSV files behind file_path, after pruning by partition_filters"""
+        if os.path.isdir(self.file_path):
+            files = glob.glob(os.path.join(self.file_path, '**', '*.csv'), recursive=True)
+        elif glob.has_magic(self.file_path):
+            files = glob.glob(self.file_path, recursive=True)
+        else:
+            files = [self.file_path]
         
+        files = sorted(f for f in files if self._partition_matches(f))
+        if not files:
+            raise FileNotFoundError(f"No CSV files match {self.file_path} "
+                                    f"with filters {self.partition_filters}")
+        return files
+    
+    def _partition_matches(self, path):
+        """True if the file's partition values pass every filter"""
+        values = partition_values(os.path.relpath(os.path.abspath(path), self._base_dir()))
+        for key, allowed in self.partition_filters.items():
+            if isinstance(allowed, str):
+                allowed = [allowed]
+            if values.get(key) not in {str(v) for v in allowed}:
+                return False
+        return True
+    
+    def _read_csv(self, path, **kwargs):
+        """Read the raw export with only the needed columns and compact dtypes"""
+        self.csv_parses += 1
+        return pd.read_csv(path, usecols=RAW_COLUMNS, dtype=READ_DTYPES, **kwargs)
+    
+    @staticmethod
+    def _clean_frame(df):
+        """Drop 'Average' summary rows and coerce columns to the compact schema"""
         # Remove average rows for initial analysis
-        self.df_clean = self.df[~self.df['test_number'].astype(str).str.contains('Average')]
+        df_clean = df[~df['test_number'].astype(str).str.contains('Average')].copy()
         # Convert numeric columns
-        self.df_clean['score'] = pd.to_numeric(self.df_clean['score'], errors='coerce')
-        self.df_clean['test_number'] = pd.to_numeric(self.df_clean['test_number'], errors='coerce')
+        df_clean['score'] = pd.to_numeric(df_clean['score'], errors='coerce')
+        df_clean['test_number'] = pd.to_numeric(df_clean['test_number'], errors='coerce')
         # Drop rows with NaN values
-        self.df_clean = self.df_clean.dropna()
+        df_clean = df_clean.dropna()
         
-        print(f"Data loaded successfully with {len(self.df_clean)} records")
-        return self.df_clean
+        for col, dtype in COMPACT_SCHEMA.items():
+            df_clean[col] = DataProcessor._downcast(df_clean[col], dtype)
+        if not isinstance(df_clean['subject'].dtype, pd.CategoricalDtype):
+            df_clean['subject'] = df_clean['subject'].astype('category')
+        return df_clean
+    
+    @staticmethod
+    def _default_footprint(df):
+        """Bytes df would take with pandas' default dtypes (64-bit numbers, object text)"""
+        total = df.index.memory_usage()
+        for name in df.columns:
+            series = df[name]
+            if pd.api.types.is_numeric_dtype(series.dtype):
+                total += 8 * len(series)
+            else:
+                total += series.astype(object).memory_usage(deep=True, index=False)
+        return total
     
-    def preprocess_data(self):
-        """Preprocess data for model training"""
-        if self.df is None:
-            self.load_data()
+    @staticmethod
+    def _downcast(series, dtype):
+        """Cast to an integer dtype if every value fits, else to float64"""
+        info = np.iinfo(dtype)
+        values = series.to_numpy()
+        if len(values) == 0 or (
+                (values == np.round(values)).all()
+                and values.min() >= info.min and values.max() <= info.max):
+            return series.astype(dtype)
+        # Fractional or out-of-range values: keep them exact rather than truncate
+        return series.astype(np.float64)
+    
+    def _cache_path(self):
+        """Path of the columnar cache bundle for the current source"""
+        if os.path.isfile(self.file_path):
+            base = os.path.splitext(os.path.basename(self.file_path))[0]
+        else:
+            # Partitioned sources are keyed by their location and filters
+            key = json.dumps([os.path.abspath(self.file_path), self.partition_filters],
+                             sort_keys=True, default=str)
+            base = 'partitioned_' + hashlib.sha1(key.encode()).hexdigest()[:12]
+        return os.path.join(self.cache_dir, f"{base}.npz")
+    
+    def _file_fingerprint(self, with_hash=True):
+        """Paths, sizes, mtimes and (optionally) content hash of the source CSVs"""
+        files = []
+        for path in self._source_files():
+            stat = os.stat(path)
+            files.append({'path': os.path.abspath(path), 'size': stat.st_size,
+                          'mtime_ns': stat.st_mtime_ns})
+        fingerprint = {'files': files}
+        if with_hash:
+            digest = hashlib.sha1()
+            for entry in files:
+                with open(entry['path'], 'rb') as f:
+                    for block in iter(lambda: f.read(1 << 20), b''):
+                        digest.update(block)
+            fingerprint['sha1'] = digest.hexdigest()
+        return fingerprint
+    
+    def _load_cache(self):
+        """Return the cached clean frame, or None if missing or stale"""
+        cache_path = self._cache_path()
+        if not os.path.exists(cache_path):
+            return None
+        
+        try:
+            with np.load(cache_path, allow_pickle=False) as bundle:
+                meta = json.loads(str(bundle['__meta__']))
+                if meta.get('version') != CACHE_FORMAT_VERSION:
+                    return None
+                
+                # A different file set or size means the data changed; matching
+                # mtimes mean it did not. Only when an mtime moved do we pay for
+                # hashing the content.
+                current = self._file_fingerprint(with_hash=False)['files']
+                cached_fp = meta['fingerprint']
+                cached_files = cached_fp['files']
+                if [(f['path'], f['size']) for f in current] != \
+                        [(f['path'], f['size']) for f in cached_files]:
+                    return None
+                touched = None
+                if [f['mtime_ns'] for f in current] != [f['mtime_ns'] for f in cached_files]:
+                    touched = self._file_fingerprint()
+                    if touched['sha1'] != cached_fp['sha1']:
+                        return None
+                
+                columns = {}
+                for col in meta['columns']:
+                    name, kind = col['name'], col['kind']
+                    values = bundle[f"col_{name}"]
+                    if kind in ('category', 'string'):
+                        categories = bundle[f"cat_{name}"].astype(object)
+                        values = pd.Categorical.from_codes(values, categories=categories)
+                        if kind == 'string':
+                            values = np.asarray(values, dtype=object)
+                    columns[name] = values
+                cached = pd.DataFrame(columns)
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Ignoring unreadable cache {cache_path}: {e}")
+            return None
+        
+        if touched is not None:
+            # Same content under new mtimes: record them so the next load
+            # takes the cheap path instead of hashing again
+            self._write_cache(cached, fingerprint=touched)
+        return cached
+    
+    def _write_cache(self, df, fingerprint=None):
+        """Write df as a typed columnar .npz bundle keyed by the CSV fingerprint"""
+        arrays = {}
+        columns = []
+        for name in df.columns:
+            series = df[name]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                kind = 'category'
+                arrays[f"col_{name}"] = series.cat.codes.to_numpy()
+                arrays[f"cat_{name}"] = np.asarray(series.cat.categories, dtype=str)
+            elif pd.api.types.is_numeric_dtype(series.dtype):
+                kind = 'numeric'
+                arrays[f"col_{name}"] = series.to_numpy()
+            else:
+                kind = 'string'
+                categorical = pd.Categorical(series)
+                arrays[f"col_{name}"] = categorical.codes
+                arrays[f"cat_{name}"] = np.asarray(categorical.categories, dtype=str)
+            columns.append({'name': name, 'kind': kind})
+        
+        meta = {
+            'version': CACHE_FORMAT_VERSION,
+            'fingerprint': fingerprint or self._file_fingerprint(),
+            'columns': columns
+        }
+        arrays['__meta__'] = np.array(json.dumps(meta))
+        
+        os.makedirs(self.cache_dir, exist_ok=True)
+        cache_path = self._cache_path()
+        # Write to a temp file first so readers never see a half-written bundle
+        tmp_path = cache_path + '.tmp.npz'
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, cache_path)
+        print(f"Cached clean data to {cache_path}")
+    
+    def preprocess_data(self, chunksize=None, n_jobs=None):
+        """Preprocess data for model training
+        
+        With chunksize set, the CSV is streamed in chunks of that many rows and
+        only per-(student, subject) running sums and counts are kept, so memory
+        is bounded by the number of students rather than the number of rows.
+        
+        With n_jobs set (-1 for all cores), rows are sharded by a hash of
+        student_id and each shard is aggregated in a separate process.
         
-        # Calculate average scores per student per subject
-        student_subjects = self.df_clean.groupby(['student_id', 'subject'])['score'].mean().reset_index()
+        With db_path set, the store's summary tables are read instead and
+        neither option applies.
+        """
+        if self.db_path is not None:
+            if chunksize is not None or n_jobs is not None:
+                raise ValueError("chunksize and n_jobs do not apply to a result store (db_path)")
+            # Trigger-maintained summary tables already hold the aggregates
+            score_sum, score_count, test_sum = self.get_result_store().aggregates()
+        elif chunksize is not None:
+            if n_jobs is not None:
+                raise ValueError("chunksize and n_jobs cannot be combined")
+            score_sum, score_count, test_sum = self._aggregate_chunks(chunksize)
+        else:
+            if self.df is None:
+                self.load_data()
+            
+            if n_jobs is not None and effective_n_jobs(n_jobs) > 1:
+                score_sum, score_count, test_sum = self._aggregate_sharded(n_jobs)
+            else:
+                # Sum and count scores per student per subject, and track
+                # time spent (using test numbers as proxy)
+                score_sum, score_count, test_sum = aggregate_results(self.df_clean)
+        
+        # Keep the aggregates so new results can be folded in without raw history
+        self.score_sums = score_sum
+        self.score_counts = score_count
+        self.test_number_sums = test_sum
+        
+        # Store processed data
+        self.processed_data = self._matrix_from_aggregates()
+        self.rating_matrix = None
+        self.data_version += 1
+        print(f"Data preprocessing complete. Final shape: {self.processed_data.shape}")
         
+        return self.processed_data
+    
+    def update_scores(self, new_results, persist=True):
+        """Fold a batch of new test results into processed_data
+        
+        new_results holds (student_id, subject, test_number, score) rows. Only
+        the affected students are recomputed, from the stored sums and counts;
+        df_clean is not extended. A subject never seen before changes every
+        student's average (missing subjects count as 0), so it forces a
+        rebuild of all rows, still from the aggregates.
+        
+        With persist, the rows are first written to the result store or the
+        ingested-results CSV, so later loads include them; with neither set
+        they live in memory only. persist=False defers that to a later
+        persist_results() call.
+        """
+        if self.processed_data is None:
+            self.preprocess_data()
+        
+        delta = self._clean_frame(
+            new_results[['student_id', 'subject', 'test_number', 'score']])
+        if delta.empty:
+            return self.processed_data
+        
+        if persist:
+            # Persist first so the stored results stay the source of truth
+            self.persist_results(delta)
+        
+        delta_sum, delta_count, delta_tests = aggregate_results(delta)
+        self.score_sums = self.score_sums.add(delta_sum, fill_value=0)
+        self.score_counts = self.score_counts.add(delta_count, fill_value=0)
+        self.test_number_sums = self.test_number_sums.add(delta_tests, fill_value=0)
+        
+        known_subjects = set(self.score_sums.index.get_level_values('subject'))
+        subject_cols = [col for col in self.processed_data.columns 
+                       if col not in ['average_score', 'performance_tier', 'time_spent']]
+        if known_subjects != set(subject_cols):
+            self.processed_data = self._matrix_from_aggregates()
+        else:
+            affected = delta['student_id'].unique()
+            updated_rows = self._matrix_from_aggregates(affected)
+            kept = self.processed_data.drop(affected, errors='ignore')
+            self.processed_data = pd.concat([kept, updated_rows]).sort_index()
+        
+        self.rating_matrix = None
+        self.data_version += 1
+        print(f"Applied {len(delta)} new results; final shape: {self.processed_data.shape}")
+        return self.processed_data
+    
+    def get_result_store(self, import_chunksize=100000):
+        """Open the SQLite result store, importing file_path if it is empty"""
+        if self._result_store is None:
+            store = ResultStore(self.db_path)
+            if store.count() == 0 and self.file_path is not None:
+                print(f"Importing {self.file_path} into {self.db_path}")
+                # One transaction: an interrupted import leaves the store
+                # empty, so the next open imports again from scratch
+                store.import_results(
+                    self._clean_frame(chunk) for path in self._source_files()
+                    for chunk in self._read_csv(path, chunksize=import_chunksize))
+                print(f"Imported {store.count()} records")
+            self._result_store = store
+        return self._result_store
+    
+    def _aggregate_chunks(self, chunksize):
+        """Stream the CSV and accumulate (sum, count) per student/subject"""
+        print(f"Streaming data from {self.file_path} in chunks of {chunksize} rows")
+        score_sum = None
+        score_count = None
+        test_sum = None
+        n_records = 0
+        
+        chunks = (chunk for path in self._source_files()
+                  for chunk in self._read_csv(path, chunksize=chunksize))
+        ingested = self._read_ingested(chunksize=chunksize)
+        if ingested is not None:
+            chunks = itertools.chain(chunks, ingested)
+        for chunk in chunks:
+            chunk = self._clean_frame(chunk)
+            n_records += len(chunk)
+            
+            chunk_sum, chunk_count, chunk_tests = aggregate_results(chunk)
+            if score_sum is None:
+                score_sum, score_count, test_sum = chunk_sum, chunk_count, chunk_tests
+            else:
+                score_sum = score_sum.add(chunk_sum, fill_value=0)
+                score_count = score_count.add(chunk_count, fill_value=0)
+                test_sum = test_sum.add(chunk_tests, fill_value=0)
+        
+        if score_sum is None:
+            raise ValueError(f"No records found in {self.file_path}")
+        print(f"Streamed {n_records} records")
+        return score_sum, score_count, test_sum
+    
+    def _aggregate_sharded(self, n_jobs):
+        """Aggregate df_clean in student_id hash shards across worker processes"""
+        n_shards = effective_n_jobs(n_jobs)
+        shard_ids = pd.util.hash_array(self.df_clean['student_id'].to_numpy()) % n_shards
+        # One stable sort groups the rows by shard; each shard is then a slice
+        order = np.argsort(shard_ids, kind='stable')
+        bounds = np.searchsorted(shard_ids[order], np.arange(n_shards + 1))
+        shards = [self.df_clean.iloc[order[bounds[k]:bounds[k + 1]]] for k in range(n_shards)]
+        print(f"Preprocessing {len(self.df_clean)} records in {n_shards} shards")
+        
+        results = Parallel(n_jobs=n_shards)(
+            delayed(aggregate_results)(shard) for shard in shards if len(shard))
+        
+        # Shards hold disjoint students, so their aggregates simply stack
+        score_sum, score_count, test_sum = (
+            pd.concat(parts).sort_index() for parts in zip(*results))
+        return score_sum, score_count, test_sum
+    
+    def _matrix_from_aggregates(self, student_ids=None):
+        """Build student matrix rows from the stored sums and counts"""
+        score_sum = self.score_sums
+        score_count = self.score_counts
+        test_sum = self.test_number_sums
+        subjects = sorted(score_sum.index.get_level_values('subject').unique())
+        
+        if student_ids is not None:
+            mask = score_sum.index.get_level_values('student_id').isin(student_ids)
+            score_sum = score_sum[mask]
+            score_count = score_count[mask]
+            test_sum = test_sum[test_sum.index.isin(student_ids)]
+        
+        student_subjects = (score_sum / score_count).rename('score').reset_index()
+        # fill_value=0 upcasts to float; test numbers are integral
+        time_spent = test_sum.astype('int64').reset_index()
+        time_spent.columns = ['student_id', 'time_spent']
+        # Keep the public index as int64 whatever the compact storage dtype
+        student_subjects['student_id'] = student_subjects['student_id'].astype('int64')
+        time_spent['student_id'] = time_spent['student_id'].astype('int64')
+        return self._build_student_matrix(student_subjects, time_spent, subjects)
+    
+    def _build_student_matrix(self, student_subjects, time_spent, subjects=None):
+        """Pivot per-subject means into the student matrix and attach derived columns"""
         # Pivot to get subjects as columns
         student_matrix = student_subjects.pivot(index='student_id', columns='subject', values='score')
+        if subjects is not None:
+            # Partial rebuilds must still carry every subject column
+            student_matrix = student_matrix.reindex(columns=subjects)
         
         # Fill NaN values with 0
         student_matrix = student_matrix.fillna(0)
@@ -50,25 +522,19 @@ class DataProcessor:
             labels=['Below 40', '40-50', '50-70', '70-80', 'Above 80']
         )
         
-        # Track time spent (using test numbers as proxy)
-        time_spent = self.df_clean.groupby('student_id')['test_number'].sum().reset_index()
-        time_spent.columns = ['student_id', 'time_spent']
-        
         # Merge time spent with student matrix
         student_matrix_reset = student_matrix.reset_index()
         final_data = pd.merge(student_matrix_reset, time_spent, on='student_id')
         
         # Set student_id as index again
-        final_data = final_data.set_index('student_id')
-        
-        # Store processed data
-        self.processed_data = final_data
-        print(f"Data preprocessing complete. Final shape: {self.processed_data.shape}")
-        
-        return self.processed_data
+        return final_data.set_index('student_id')
     
-    def identify_strengths_weaknesses(self):
-        """Identify student strengths and weaknesses"""
+    def identify_strengths_weaknesses(self, as_dict=False):
+        """Identify student strengths and weaknesses
+        
+        Returns a DataFrame indexed by student_id with best/worst subject and
+        score columns. Pass as_dict=True for the {student_id: {...}} view.
+        """
         if self.processed_data is None:
             self.preprocess_data()
         
@@ -76,29 +542,61 @@ class DataProcessor:
         subject_cols = [col for col in self.processed_data.columns 
                        if col not in ['average_score', 'performance_tier', 'time_spent']]
         
-        # For each student, identify best and worst subjects
-        strengths_weaknesses = {}
+        # Best and worst subject for every student in one pass over the score block
+        scores = self.processed_data[subject_cols].to_numpy(dtype=float)
+        rows = np.arange(len(scores))
+        best_idx = scores.argmax(axis=1)
+        worst_idx = scores.argmin(axis=1)
+        subjects = np.asarray(subject_cols, dtype=object)
         
-        for student_id in self.processed_data.index:
-            student_data = self.processed_data.loc[student_id]
-            subject_scores = student_data[subject_cols]
-            
-            best_subject = subject_scores.idxmax()
-            worst_subject = subject_scores.idxmin()
-            
-            strengths_weaknesses[student_id] = {
-                'best_subject': best_subject,
-                'best_score': student_data[best_subject],
-                'worst_subject': worst_subject,
-                'worst_score': student_data[worst_subject],
-                'average_score': student_data['average_score'],
-                'performance_tier': student_data['performance_tier']
-            }
+        strengths_weaknesses = pd.DataFrame({
+            'best_subject': subjects[best_idx],
+            'best_score': scores[rows, best_idx],
+            'worst_subject': subjects[worst_idx],
+            'worst_score': scores[rows, worst_idx],
+            'average_score': self.processed_data['average_score'].to_numpy(),
+            'performance_tier': self.processed_data['performance_tier'].array
+        }, index=self.processed_data.index)
         
+        if as_dict:
+            return strengths_weaknesses.to_dict(orient='index')
         return strengths_weaknesses
     
-    def get_features_and_labels(self):
-        """Split data into features and labels"""
+    def get_rating_matrix(self):
+        """Sparse student x subject matrix of observed mean scores"""
+        if self.processed_data is None:
+            self.preprocess_data()
+        
+        if self.rating_matrix is None:
+            self.rating_matrix = RatingMatrix.from_aggregates(self.score_sums, self.score_counts)
+        return self.rating_matrix
+    
+    def impute_scores(self, model):
+        """Student matrix with unobserved subjects filled from a fitted model
+        
+        model is a RatingPredictor fitted on get_rating_matrix() (e.g. an
+        ALSFactorizer). Observed means are kept; only the cells preprocess_data
+        would fill with 0 are predicted, and average_score and
+        performance_tier are recomputed from the completed scores.
+        processed_data itself is left unchanged.
+        """
+        if self.processed_data is None:
+            self.preprocess_data()
+        
+        completed = model.complete_matrix()
+        student_subjects = completed.stack().rename('score').reset_index()
+        time_spent = self.test_number_sums.astype('int64').reset_index()
+        time_spent.columns = ['student_id', 'time_spent']
+        time_spent['student_id'] = time_spent['student_id'].astype('int64')
+        return self._build_student_matrix(student_subjects, time_spent, list(completed.columns))
+    
+    def get_features_and_labels(self, sparse_features=False):
+        """Split data into features and labels
+        
+        With sparse_features=True, X is a CSR matrix built from the rating
+        matrix (unobserved subjects left implicit) followed by average_score
+        and time_spent, in the same column order as the dense frame.
+        """
         if self.processed_data is None:
             self.preprocess_data()
         
@@ -107,11 +605,18 @@ class DataProcessor:
         # Label: performance_tier
         y = self.processed_data['performance_tier']
         
+        if sparse_features:
+            ratings = self.get_rating_matrix()
+            rows = ratings.rows_for(self.processed_data.index)
+            extras = sparse.csr_matrix(
+                self.processed_data[['average_score', 'time_spent']].to_numpy(dtype=float))
+            X = sparse.hstack([ratings.matrix[rows], extras], format='csr')
+        
         return X, y
     
-    def split_data(self, test_size=0.2, random_state=42):
+    def split_data(self, test_size=0.2, random_state=42, sparse_features=False):
         """Split data into training and test sets"""
-        X, y = self.get_features_and_labels()
+        X, y = self.get_features_and_labels(sparse_features=sparse_features)
         X_train, X_test, y_train, y_test = train_test_split(
             X, y, test_size=test_size, random_state=random_state
         )
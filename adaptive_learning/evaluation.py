@@ -0,0 +1,166 @@
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from rating_matrix import RatingMatrix
+from collaborative_filter import ItemItemCF, UserUserCF
+from matrix_factorization import ALSFactorizer
+
+# Recommender engines compared by default: name -> factory(train ratings) -> fitted model
+DEFAULT_BACKENDS = {
+    'item_item_cf': lambda ratings: ItemItemCF().fit(ratings),
+    'user_user_cf': lambda ratings: UserUserCF().fit(ratings),
+    'als': lambda ratings: ALSFactorizer().fit(ratings)
+}
+
+
+def temporal_split(df, holdout_tests=1):
+    """
+    Per-student temporal holdout of cleaned (student_id, subject, test_number, score) rows.
+
+    Each student's last holdout_tests test_numbers are held out. Both sides
+    are averaged per (student, subject) like the processed data. Returns the
+    train RatingMatrix and the held-out scores as a dense array aligned to
+    its rows and items, with NaN where nothing was held out.
+    """
+    test_numbers = df['test_number'].astype(np.int64)
+    cutoff = test_numbers.groupby(df['student_id']).transform('max') - holdout_tests
+    held_out = test_numbers > cutoff
+
+    train_means = df[~held_out].groupby(['student_id', 'subject'], observed=True)['score'].mean()
+    train = RatingMatrix.from_long(
+        train_means.index.get_level_values('student_id').to_numpy(),
+        train_means.index.get_level_values('subject').astype(str).to_numpy(),
+        train_means.to_numpy())
+
+    test_means = df[held_out].groupby(['student_id', 'subject'], observed=True)['score'].mean()
+    students = test_means.index.get_level_values('student_id')
+    subjects = test_means.index.get_level_values('subject').astype(str)
+    known = students.isin(train.student_ids) & subjects.isin(train.items)
+    test = np.full(train.shape, np.nan)
+    test[[train.student_index[sid] for sid in students[known].tolist()],
+         [train.item_index[item] for item in subjects[known].tolist()]] = test_means.to_numpy()[known]
+    return train, test
+
+
+def ranking_metrics(predictions, test_scores, k=3, relevance_threshold=60):
+    """
+    Summed precision@k, recall@k and NDCG@k for a block of students, plus how many were scored.
+
+    Items are ranked lowest predicted score first, as the course recommender
+    targets weak subjects. Only items with a held-out score are ranked, and an
+    item is relevant when its held-out score is below relevance_threshold.
+    Students with no relevant item are skipped.
+    """
+    has_test = ~np.isnan(test_scores)
+    relevant = has_test & (np.nan_to_num(test_scores, nan=np.inf) < relevance_threshold)
+    n_relevant = relevant.sum(axis=1)
+    scored = n_relevant > 0
+
+    keys = np.where(has_test, predictions, np.inf)
+    k = min(k, keys.shape[1])
+    top = np.argsort(keys, axis=1, kind='stable')[:, :k]
+    rows = np.arange(len(keys))[:, None]
+    hits = relevant[rows, top] & np.isfinite(keys[rows, top])
+
+    discounts = 1.0 / np.log2(np.arange(2, k + 2))
+    dcg = (hits * discounts).sum(axis=1)
+    ideal = np.cumsum(discounts)[np.minimum(n_relevant, k) - 1]
+    n_hits = hits.sum(axis=1)
+    return {
+        'precision': float((n_hits / k)[scored].sum()),
+        'recall': float((n_hits / np.maximum(n_relevant, 1))[scored].sum()),
+        'ndcg': float((dcg / ideal)[scored].sum()),
+        'students': int(scored.sum())
+    }
+
+
+class RecommenderEvaluator:
+    """
+    Offline comparison of recommender backends on a temporal holdout.
+
+    Every backend is fitted on the same train split, once timed and once
+    under tracemalloc for its peak memory, since tracing slows allocation
+    and would inflate the timing. It then predicts every student's items in
+    blocks. RMSE and the ranking metrics are accumulated block by block with
+    array operations, and per-query latency is timed on a sample of
+    single-student predictions.
+
+    Ranking at k >= the number of items returns every item, which makes
+    recall@k always 1 and says nothing about the order, so k defaults to
+    one below the item count and larger values are rejected.
+    """
+
+    def __init__(self, df, holdout_tests=1, k=None, relevance_threshold=60,
+                 block_size=4096, latency_sample=200, seed=42):
+        self.relevance_threshold = relevance_threshold
+        self.block_size = block_size
+        self.latency_sample = latency_sample
+        self.seed = seed
+        self.train, self.test = temporal_split(df, holdout_tests=holdout_tests)
+        n_items = self.train.shape[1]
+        self.k = max(1, n_items - 1) if k is None else k
+        if n_items > 1 and self.k >= n_items:
+            raise ValueError(f"k={self.k} ranks all {n_items} items; use k < {n_items}")
+
+    def evaluate(self, backends=None):
+        """One row of metrics and costs per backend"""
+        backends = backends or DEFAULT_BACKENDS
+        results = []
+        for name, factory in backends.items():
+            started = time.perf_counter()
+            model = factory(self.train)
+            fit_seconds = time.perf_counter() - started
+            peak = self._fit_peak_bytes(factory)
+
+            results.append({'backend': name, 'fit_seconds': fit_seconds,
+                            'fit_peak_mb': peak / 1024 ** 2,
+                            **self._accuracy(model), **self._latency(model)})
+        return pd.DataFrame(results).set_index('backend')
+
+    def _fit_peak_bytes(self, factory):
+        """Peak traced memory of a separate, untimed fit"""
+        tracemalloc.start()
+        try:
+            factory(self.train)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return peak
+
+    def _accuracy(self, model):
+        squared_error, n_scores = 0.0, 0
+        totals = {'precision': 0.0, 'recall': 0.0, 'ndcg': 0.0, 'students': 0}
+        for start in range(0, self.train.shape[0], self.block_size):
+            rows = np.arange(start, min(start + self.block_size, self.train.shape[0]))
+            predictions = model.predict_rows(rows)
+            test_scores = self.test[rows]
+            has_test = ~np.isnan(test_scores)
+            squared_error += float(((predictions - np.nan_to_num(test_scores)) ** 2)[has_test].sum())
+            n_scores += int(has_test.sum())
+            block = ranking_metrics(predictions, test_scores, k=self.k,
+                                    relevance_threshold=self.relevance_threshold)
+            for name in totals:
+                totals[name] += block[name]
+
+        students = max(totals['students'], 1)
+        return {
+            'rmse': np.sqrt(squared_error / n_scores) if n_scores else np.nan,
+            f'precision@{self.k}': totals['precision'] / students,
+            f'recall@{self.k}': totals['recall'] / students,
+            f'ndcg@{self.k}': totals['ndcg'] / students,
+            'ranked_students': totals['students']
+        }
+
+    def _latency(self, model):
+        rng = np.random.default_rng(self.seed)
+        sample = rng.choice(self.train.shape[0], size=min(self.latency_sample, self.train.shape[0]),
+                            replace=False)
+        times = []
+        for row in sample.tolist():
+            started = time.perf_counter()
+            model.predict_rows(np.array([row]))
+            times.append(time.perf_counter() - started)
+        times = np.array(times) * 1000
+        return {'query_p50_ms': float(np.percentile(times, 50)),
+                'query_p95_ms': float(np.percentile(times, 95))}
@@ -0,0 +1,148 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from rating_matrix import RatingMatrix
+
+# Bump whenever the on-disk array layout changes
+FEATURE_STORE_VERSION = 2
+
+TIER_LABELS = ['Below 40', '40-50', '50-70', '70-80', 'Above 80']
+
+# Fixed-width arrays making up a store, with their on-disk dtypes
+STORE_ARRAYS = {
+    'student_ids': np.int64,
+    'subject_scores': np.float64,
+    # True where the student has results in the subject; a 0 score may be either
+    'subject_observed': np.bool_,
+    'average_score': np.float64,
+    'tier_codes': np.int8,
+    'time_spent': np.int64
+}
+
+
+class FeatureStore:
+    """
+    Memory-mapped, read-only view of the processed student matrix.
+
+    Each column group is a fixed-width .npy file opened with mmap_mode='r',
+    so every process that opens the same store shares its pages through the
+    OS page cache instead of holding its own pandas copy. student_ids is
+    sorted, and rows are located with a binary search.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != FEATURE_STORE_VERSION:
+            raise ValueError(f"Unsupported feature store version in {path}: "
+                             f"{self.meta.get('version')}")
+
+        self.subjects = self.meta['subjects']
+        self.tier_labels = self.meta['tier_labels']
+        for name in STORE_ARRAYS:
+            setattr(self, name, np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r'))
+
+    @classmethod
+    def open(cls, path):
+        """Open an existing store without loading any of its arrays"""
+        return cls(path)
+
+    @staticmethod
+    def write(processed_data, path, ratings=None):
+        """Persist a processed_data frame as a feature store at path
+
+        ratings (the matching RatingMatrix) tells observed scores from the 0
+        placeholders of missing subjects; without it nonzero scores count as
+        observed.
+        """
+        subject_cols = [col for col in processed_data.columns
+                       if col not in ['average_score', 'performance_tier', 'time_spent']]
+        data = processed_data.sort_index()
+        tiers = pd.Categorical(data['performance_tier'], categories=TIER_LABELS)
+        if ratings is not None:
+            observed = ratings.observed_mask()[ratings.rows_for(data.index)]
+            columns = [ratings.item_index[subject] for subject in subject_cols]
+            observed = observed[:, columns].toarray() > 0
+        else:
+            observed = data[subject_cols].to_numpy() != 0
+
+        arrays = {
+            'student_ids': data.index.to_numpy(),
+            'subject_scores': data[subject_cols].to_numpy(),
+            'subject_observed': observed,
+            'average_score': data['average_score'].to_numpy(),
+            # -1 marks a student outside every tier bin (e.g. an average of 0)
+            'tier_codes': tiers.codes,
+            'time_spent': data['time_spent'].to_numpy()
+        }
+
+        os.makedirs(path, exist_ok=True)
+        # Readers go through meta.json, so drop it first and write it last
+        meta_path = os.path.join(path, 'meta.json')
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        for name, dtype in STORE_ARRAYS.items():
+            # Never overwrite an array in place: a reader may have it mapped,
+            # and truncating a mapped file faults the reader. Replacing the
+            # name leaves open mappings on the old file.
+            array_path = os.path.join(path, f"{name}.npy")
+            tmp_path = os.path.join(path, f"{name}.tmp.npy")
+            np.save(tmp_path, np.ascontiguousarray(arrays[name], dtype=dtype))
+            os.replace(tmp_path, array_path)
+
+        meta = {
+            'version': FEATURE_STORE_VERSION,
+            'n_students': len(data),
+            'subjects': subject_cols,
+            'tier_labels': TIER_LABELS
+        }
+        with open(meta_path + '.tmp', 'w') as f:
+            json.dump(meta, f)
+        os.replace(meta_path + '.tmp', meta_path)
+        print(f"Feature store with {len(data)} students written to {path}")
+        return path
+
+    def __len__(self):
+        return len(self.student_ids)
+
+    def __contains__(self, student_id):
+        return self.position(student_id) is not None
+
+    def position(self, student_id):
+        """Row position of student_id, or None if absent"""
+        i = int(np.searchsorted(self.student_ids, student_id))
+        if i < len(self.student_ids) and self.student_ids[i] == student_id:
+            return i
+        return None
+
+    def get_student(self, student_id):
+        """One student's row as a dict shaped like processed_data.loc[id].to_dict()"""
+        i = self.position(student_id)
+        if i is None:
+            return None
+
+        row = {subj: float(score) for subj, score in zip(self.subjects, self.subject_scores[i])}
+        code = int(self.tier_codes[i])
+        row['average_score'] = float(self.average_score[i])
+        row['performance_tier'] = self.tier_labels[code] if code >= 0 else np.nan
+        row['time_spent'] = int(self.time_spent[i])
+        return row
+
+    def rating_matrix(self):
+        """RatingMatrix of the observed scores, as DataProcessor.get_rating_matrix builds it"""
+        rows, cols = np.nonzero(self.subject_observed)
+        return RatingMatrix.from_long(np.asarray(self.student_ids)[rows],
+                                      np.asarray(self.subjects, dtype=object)[cols],
+                                      np.asarray(self.subject_scores)[rows, cols])
+
+    def to_frame(self):
+        """Materialise the store as a processed_data-style DataFrame (copies)"""
+        frame = pd.DataFrame(np.array(self.subject_scores), columns=self.subjects,
+                             index=pd.Index(np.array(self.student_ids), name='student_id'))
+        frame['average_score'] = np.array(self.average_score)
+        frame['performance_tier'] = pd.Categorical.from_codes(
+            np.array(self.tier_codes), categories=self.tier_labels, ordered=True)
+        frame['time_spent'] = np.array(self.time_spent)
+        return frame
@@ -1,7 +1,6 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import joblib
 import os
 import sys
 import matplotlib.pyplot as plt
@@ -12,8 +11,14 @@ import json
 # Add parent directory to path to import modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from data_processor import DataProcessor
-from model_trainer import ModelTrainer
+from model_trainer import ModelTrainer, INTERACTION_LOG_PATH
 from course_generator import CourseGenerator
+from data_context import DataContext
+from collaborative_filter import UserUserCF
+from batch_recommender import BatchRecommender, RecommendationTable
+from interaction_log import InteractionLog
+from similarity_cache import SimilarityCache
+from feature_store import FeatureStore
 
 def load_images(image_path):
     """Load and return image if it exists, otherwise return None"""
@@ -40,17 +45,86 @@ def verify_operation(func):
             st.stop()
     return wrapper
 
-@verify_operation
-def load_model_safely():
-    model_path = os.path.join('models', 'performance_predictor.pkl')
-    if not os.path.exists(model_path):
-        raise FileNotFoundError("Model not found - training new model")
-    return joblib.load(model_path)
-
 @verify_operation
 def predict_performance_safely(model, data):
     return model.predict(data)
 
+@st.cache_resource
+def load_feature_store():
+    """Memory-mapped student matrix written by run_pipeline.py, or None if missing"""
+    store_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              'feature_store')
+    if not os.path.exists(os.path.join(store_path, 'meta.json')):
+        return None
+    try:
+        return FeatureStore.open(store_path)
+    except ValueError as e:
+        # Written by an older version; the dataset path still works until the next pipeline run
+        print(f"Ignoring feature store: {e}")
+        return None
+
+@st.cache_resource
+def load_trainer():
+    """Shared ModelTrainer; it reads students from the feature store, not the dataset"""
+    dataset_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'highschool_subject_performance_dataset.csv')
+    return ModelTrainer(dataset_path, feature_store=load_feature_store())
+
+@st.cache_resource
+def load_peer_model():
+    """Build the "students like you" index once per server process"""
+    dataset_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'highschool_subject_performance_dataset.csv')
+    store = load_feature_store()
+    if store is not None:
+        ratings = store.rating_matrix()
+    elif os.path.exists(dataset_path):
+        ratings = DataContext.shared(dataset_path).processor.get_rating_matrix()
+    else:
+        return None
+    # Neighbour rows persist across restarts and are dropped when the ratings change
+    cache = SimilarityCache(cache_dir=os.path.join(os.path.dirname(dataset_path), 'cache', 'similarity'),
+                            memory_budget_bytes=16 * 1024 * 1024,
+                            disk_budget_bytes=64 * 1024 * 1024)
+    return UserUserCF(k=20, cache=cache).fit(ratings)
+
+@st.cache_resource
+def load_cohort_clusters():
+    """Cohort centroids with their precomputed tier and course bundles"""
+    return load_trainer().get_cohort_clusters()
+
+@st.cache_resource
+def load_recommendation_table():
+    """Precomputed top-k modules per student, written by the batch scoring job"""
+    table_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              'models', 'top_k_recommendations.npz')
+    if not os.path.exists(table_path):
+        return None
+    return RecommendationTable(table_path)
+
+@st.cache_resource
+def load_profile_recommender():
+    """Live top-k scorer for profiles the batch table does not hold yet"""
+    return BatchRecommender(k=5)
+
+def session_student_id(label):
+    """Numeric student ID for a profile entered under label in this session
+    
+    The label is free text and is never parsed; each new label gets an ID
+    from the trainer's allocator, above every dataset student.
+    """
+    student_ids = st.session_state.setdefault('session_student_ids', {})
+    if label not in student_ids:
+        student_ids[label] = load_trainer().new_student_id()
+    return student_ids[label]
+
+def record_interaction(subject, event, value=1.0):
+    """Append an engagement event for the analysed student to the interaction log"""
+    student_data = st.session_state.get('student_data') or {}
+    if 'Student ID' in student_data:
+        student_id = session_student_id(student_data['Student ID'])
+        InteractionLog(INTERACTION_LOG_PATH).record(student_id, subject, event, value)
+
 def main():
     """Main function to configure and run the Streamlit app."""
     
@@ -663,6 +737,48 @@ def main():
                 </div>
                 """, unsafe_allow_html=True)
             
+            # Nearest cohort's precomputed tier and courses, instead of running
+            # the model and the course generator for this profile
+            cohort = load_cohort_clusters().bundle_for(
+                {"Coding": coding_score, "Math": math_score, "Social Studies": social_studies_score})
+            st.session_state.cohort_bundle = cohort
+            st.subheader("Your Cohort")
+            st.write(f"You are closest to a cohort of {cohort['size']} students whose "
+                     f"predicted performance tier is **{cohort['predicted_tier']}**.")
+            with st.expander("Courses prepared for this cohort"):
+                for subject, course in cohort['courses'].items():
+                    st.markdown(f"**{course['course_title']}** ({subject}, {course['difficulty']})")
+                    st.markdown(", ".join(module['title'] for module in course['modules']))
+            
+            # Peer-based predictions from the most similar students in the dataset
+            peer_model = load_peer_model()
+            if peer_model is not None:
+                st.subheader("Students Like You")
+                profile = {"Coding": coding_score, "Math": math_score, "Social Studies": social_studies_score}
+                peer_predictions = peer_model.predict_profile(profile)
+                peer_ids, _ = peer_model.neighbours(scores=profile)
+                
+                peer_cols = st.columns(len(peer_predictions))
+                for col, (subject, predicted) in zip(peer_cols, peer_predictions.items()):
+                    with col:
+                        st.metric(subject, f"{predicted:.1f}%",
+                                  delta=f"{predicted - profile.get(subject, predicted):+.1f}")
+                latency = peer_model.index.latency_stats()
+                cache_stats = peer_model.cache.stats()
+                st.caption(f"Based on {len(peer_ids)} similar students "
+                           f"(index query p50: {latency.get('p50_ms', 0):.2f} ms, "
+                           f"neighbour cache hit rate: {cache_stats['hit_rate']:.0%})")
+                
+                # Fold the new profile into the factor model; queue it once per
+                # session so the next batch retrain learns from it
+                queued_ids = st.session_state.setdefault('queued_student_ids', set())
+                queue_id = session_student_id(student_id)
+                factor_predictions = load_trainer().fold_in_student(
+                    profile, student_id=queue_id if queue_id not in queued_ids else None)
+                queued_ids.add(queue_id)
+                estimates = ", ".join(f"{subject} {score:.1f}%" for subject, score in factor_predictions.items())
+                st.caption(f"Latent-factor estimate: {estimates}")
+            
             # Add a button to view detailed course recommendations
             if st.button("View Recommended Courses"):
                 st.session_state.page = "Course Recommendations"
@@ -714,6 +830,21 @@ def main():
             </div>
             """, unsafe_allow_html=True)
             
+            # Profiles already batch-scored (queued, retrained and scored) are a
+            # lookup; newer ones are scored live on their folded-in estimate
+            table = load_recommendation_table()
+            student_key = session_student_id(student_data.get('Student ID', ''))
+            top_modules = table.lookup(student_key) if table is not None else None
+            if top_modules is None:
+                profile = {subject: student_data.get(subject, 0)
+                           for subject in ["Coding", "Math", "Social Studies"]}
+                top_modules = load_profile_recommender().recommend_profile(
+                    profile, load_trainer().get_factor_model().predict_profile(profile))
+            if top_modules:
+                st.markdown("#### Top Modules For You")
+                for pick in top_modules:
+                    st.markdown(f"{pick['rank']}. **{pick['module']}** ({pick['subject']}, {pick['difficulty']})")
+            
             # Generate simple course recommendations
             subject_scores = {
                 "Coding": student_data.get('Coding', 0),
@@ -800,6 +931,7 @@ def main():
                         if subject not in st.session_state.enrolled_courses:
                             st.session_state.enrolled_courses.append(subject)
                             st.session_state.credits += 100
+                            record_interaction(subject, 'enrolled')
                             st.success(f"Successfully enrolled in {course_name}! +100 credits added.")
                         else:
                             st.info(f"You are already enrolled in {course_name}.")
@@ -1150,6 +1282,10 @@ def main():
                         lesson_id = f"{subject}_lesson_{lesson_index}"
                         st.session_state.completed_lessons[lesson_id] = True
                         
+                        # Log engagement so the recommender can learn from it
+                        record_interaction(subject, 'lesson_completed')
+                        record_interaction(subject, 'progress', (progress + 1) / total_lessons)
+                        
                         st.success(f"Lesson completed successfully! +25 credits earned. Your total: {st.session_state.credits} credits")
                     else:
                         st.info("Lesson reviewed.")
@@ -0,0 +1,124 @@
+import json
+import math
+import os
+import time
+import numpy as np
+from joblib import Parallel, delayed, effective_n_jobs
+from scipy import sparse
+from sklearn.base import clone
+from sklearn.model_selection import ParameterGrid, cross_val_score
+
+
+def _score_config(estimator, params, X, y, cv, scoring):
+    started = time.perf_counter()
+    scores = cross_val_score(clone(estimator).set_params(**params), X, y, cv=cv, scoring=scoring)
+    return scores, time.perf_counter() - started
+
+
+class SuccessiveHalvingSearch:
+    """
+    Budgeted successive-halving search over a full parameter grid.
+
+    Every configuration starts on a small share of the training rows and of
+    its own n_estimators. After each round only the best 1/eta survive,
+    and the survivors' resources grow by eta, so only the last few
+    configurations ever train at full size. Configurations within a round
+    are cross-validated in parallel on n_jobs workers. The search stops at
+    the time budget and keeps the best configuration of the last round that
+    made progress. Every trial is written to history_path as it finishes.
+    """
+
+    def __init__(self, estimator, param_grid, eta=3, cv=3, scoring='accuracy',
+                 time_budget=None, n_jobs=-1, min_samples=60, min_estimators=10,
+                 history_path=None, seed=42):
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.eta = eta
+        self.cv = cv
+        self.scoring = scoring
+        self.time_budget = time_budget
+        self.n_jobs = n_jobs
+        self.min_samples = min_samples
+        self.min_estimators = min_estimators
+        self.history_path = history_path
+        self.seed = seed
+        self.history = []
+        self.best_params_ = None
+        self.best_score_ = None
+
+    def _resources(self, n_rounds, round_index, n_rows, params):
+        """(rows, n_estimators) for a configuration in a round; the last round gets everything"""
+        share = self.eta ** (round_index - (n_rounds - 1))
+        rows = min(n_rows, max(self.min_samples, int(math.ceil(n_rows * share))))
+        full_trees = params.get('n_estimators', self.estimator.get_params().get('n_estimators', 100))
+        trees = min(full_trees, max(self.min_estimators, int(math.ceil(full_trees * share))))
+        return rows, trees
+
+    def fit(self, X, y):
+        """Search the grid on (X, y); returns self with best_params_ set"""
+        started = time.perf_counter()
+        # Sparse feature matrices are row-indexed as they are
+        X = X if sparse.issparse(X) else np.asarray(X)
+        y = np.asarray(y)
+        order = np.random.default_rng(self.seed).permutation(X.shape[0])
+        X, y = X[order], y[order]
+
+        candidates = list(ParameterGrid(self.param_grid))
+        # Rounds needed to halve down to one survivor, which trains at full size
+        n_rounds, remaining = 1, len(candidates)
+        while remaining > 1:
+            remaining = max(1, remaining // self.eta)
+            n_rounds += 1
+        batch_size = effective_n_jobs(self.n_jobs)
+        self.history = []
+        out_of_time = False
+
+        for round_index in range(n_rounds):
+            results = []
+            for batch_start in range(0, len(candidates), batch_size):
+                if self.time_budget is not None and time.perf_counter() - started > self.time_budget:
+                    out_of_time = True
+                    break
+                batch = candidates[batch_start:batch_start + batch_size]
+                jobs = []
+                for params in batch:
+                    rows, trees = self._resources(n_rounds, round_index, X.shape[0], params)
+                    jobs.append((params, rows, trees))
+                outcomes = Parallel(n_jobs=self.n_jobs)(
+                    delayed(_score_config)(self.estimator, {**params, 'n_estimators': trees},
+                                           X[:rows], y[:rows], self.cv, self.scoring)
+                    for params, rows, trees in jobs)
+                for (params, rows, trees), (scores, seconds) in zip(jobs, outcomes):
+                    trial = {'round': round_index, 'params': params, 'n_samples': rows,
+                             'n_estimators_used': trees, 'mean_score': float(scores.mean()),
+                             'std_score': float(scores.std()), 'seconds': seconds}
+                    results.append(trial)
+                    self.history.append(trial)
+                self._save_history()
+
+            results.sort(key=lambda trial: trial['mean_score'], reverse=True)
+            # A round cut short by the budget has not compared every survivor
+            if results and (not out_of_time or self.best_params_ is None):
+                self.best_params_ = results[0]['params']
+                self.best_score_ = results[0]['mean_score']
+            if out_of_time or len(candidates) == 1:
+                break
+            # Keep the top 1/eta of this round for the next, larger round
+            n_keep = max(1, len(candidates) // self.eta)
+            candidates = [trial['params'] for trial in results[:n_keep]]
+
+        elapsed = time.perf_counter() - started
+        status = "stopped at the time budget" if out_of_time else "completed"
+        if self.best_params_ is None:
+            raise RuntimeError(f"Time budget of {self.time_budget}s ran out before any trial finished")
+        print(f"Successive halving {status} after {len(self.history)} trials in {elapsed:.1f}s; "
+              f"best {self.scoring} {self.best_score_:.4f} with {self.best_params_}")
+        return self
+
+    def _save_history(self):
+        if self.history_path is None:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.history_path)), exist_ok=True)
+        with open(self.history_path, 'w') as f:
+            json.dump({'param_grid': self.param_grid, 'eta': self.eta, 'cv': self.cv,
+                       'time_budget': self.time_budget, 'trials': self.history}, f, indent=2)
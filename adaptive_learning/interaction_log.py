@@ -0,0 +1,178 @@
+import csv
+import io
+import os
+import time
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# How much each kind of engagement counts towards a (student, subject) weight.
+# enrolled and lesson_completed add up per event; progress is the latest
+# fraction of the course completed, so only its maximum counts.
+EVENT_WEIGHTS = {
+    'enrolled': 1.0,
+    'lesson_completed': 0.25,
+    'progress': 2.0
+}
+
+TOTAL_COLUMNS = ['enrolled', 'lesson_completed', 'progress']
+
+
+class InteractionLog:
+    """
+    Append-only CSV of app interaction events.
+
+    Each event is one (timestamp, student_id, subject, event, value) line
+    appended with a plain file write, so recording from a Streamlit rerun
+    is cheap. Readers tail the file from a byte offset instead of reparsing it.
+    """
+
+    COLUMNS = ['timestamp', 'student_id', 'subject', 'event', 'value']
+
+    def __init__(self, path):
+        self.path = path
+
+    def record(self, student_id, subject, event, value=1.0):
+        """Append one event"""
+        if event not in EVENT_WEIGHTS:
+            raise ValueError(f"Unknown interaction event: {event}")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        new_file = not os.path.exists(self.path)
+        with open(self.path, 'a', newline='') as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(self.COLUMNS)
+            writer.writerow([time.time(), int(student_id), subject, event, float(value)])
+
+    def read_from(self, offset=0):
+        """(events appended after byte offset, new offset); a partly written last line is left for later"""
+        empty = pd.DataFrame(columns=self.COLUMNS)
+        if not os.path.exists(self.path):
+            return empty, offset
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            return empty, offset
+
+        events = pd.read_csv(io.BytesIO(data[:end]), names=self.COLUMNS,
+                             header=0 if offset == 0 else None)
+        return events, offset + end
+
+
+class ImplicitFeedback:
+    """
+    Per-(student, subject) engagement totals aggregated from an InteractionLog.
+
+    refresh() folds in only the events appended since the last call, so a
+    busy day of app usage costs one pass over that day's events rather than
+    the whole log. With state_path set, totals and the log offset survive
+    restarts.
+    """
+
+    def __init__(self, log, state_path=None, weights=None):
+        self.log = log
+        self.state_path = state_path
+        self.weights = weights or EVENT_WEIGHTS
+        self.offset = 0
+        # Aggregated pairs the last matrix() call could not place
+        self.unmatched = 0
+        self.totals = pd.DataFrame(
+            columns=TOTAL_COLUMNS, dtype=np.float64,
+            index=pd.MultiIndex.from_arrays([[], []], names=['student_id', 'subject']))
+        if state_path is not None and os.path.exists(state_path):
+            self._load_state()
+
+    def refresh(self):
+        """Aggregate newly logged events into the totals; returns how many were added"""
+        events, self.offset = self.log.read_from(self.offset)
+        if len(events) == 0:
+            return 0
+
+        events['student_id'] = events['student_id'].astype(np.int64)
+        events['value'] = events['value'].astype(np.float64)
+        new = events.pivot_table(index=['student_id', 'subject'], columns='event',
+                                 values='value', aggfunc='sum', fill_value=0.0)
+        latest_progress = events[events['event'] == 'progress'].groupby(
+            ['student_id', 'subject'])['value'].max()
+        new = new.reindex(columns=TOTAL_COLUMNS, fill_value=0.0)
+        new['progress'] = latest_progress.reindex(new.index, fill_value=0.0)
+
+        # Counts add up; progress keeps its highest value seen
+        totals = self.totals.reindex(self.totals.index.union(new.index), fill_value=0.0)
+        new = new.reindex(totals.index, fill_value=0.0)
+        totals[['enrolled', 'lesson_completed']] += new[['enrolled', 'lesson_completed']]
+        totals['progress'] = np.maximum(totals['progress'], new['progress'])
+        self.totals = totals
+
+        if self.state_path is not None:
+            self._save_state()
+        return len(events)
+
+    def confidence(self):
+        """Weighted engagement per (student_id, subject)"""
+        return sum(self.totals[name] * self.weights[name] for name in TOTAL_COLUMNS)
+
+    def matrix(self, ratings):
+        """
+        Engagement weights as a CSR aligned to a RatingMatrix's rows and items.
+
+        Students or subjects the ratings have no row or column for cannot be
+        placed; they are counted in self.unmatched instead of vanishing
+        silently, and enter the model once the student has a row (e.g. after
+        their queued scores are retrained in).
+        """
+        confidence = self.confidence()
+        students = confidence.index.get_level_values('student_id')
+        subjects = confidence.index.get_level_values('subject')
+        known = students.isin(ratings.student_ids) & subjects.isin(ratings.items)
+        self.unmatched = int((~known).sum())
+
+        rows = [ratings.student_index[sid] for sid in students[known].tolist()]
+        cols = [ratings.item_index[item] for item in subjects[known].tolist()]
+        return sparse.csr_matrix((confidence.to_numpy()[known], (rows, cols)), shape=ratings.shape)
+
+    def entry_weights(self, ratings, alpha=1.0):
+        """
+        Loss weights for the observed entries of a RatingMatrix: 1 + alpha * engagement.
+
+        The result shares ratings.matrix's sparsity structure, so it can be
+        passed straight to ALSFactorizer.fit. Engagement with subjects a
+        student has no score in has no entry to weight; unscored_confidence()
+        carries it instead.
+        """
+        m = ratings.matrix
+        rows = np.repeat(np.arange(m.shape[0]), np.diff(m.indptr))
+        engagement = np.asarray(self.matrix(ratings)[rows, m.indices]).ravel()
+        return sparse.csr_matrix((1.0 + alpha * engagement, m.indices.copy(), m.indptr.copy()),
+                                 shape=m.shape)
+
+    def unscored_confidence(self, ratings, alpha=1.0):
+        """
+        alpha * engagement for (student, subject) pairs without a score, as a CSR
+        aligned to a RatingMatrix; ALSFactorizer.fit takes it as implicit.
+        """
+        engagement = self.matrix(ratings)
+        unscored = engagement - engagement.multiply(ratings.observed_mask())
+        unscored = sparse.csr_matrix(unscored)
+        unscored.eliminate_zeros()
+        return unscored * alpha
+
+    def _save_state(self):
+        index = self.totals.index
+        tmp_path = self.state_path + '.tmp.npz'
+        np.savez(tmp_path,
+                 offset=np.array(self.offset),
+                 student_ids=index.get_level_values('student_id').to_numpy(dtype=np.int64),
+                 subjects=np.asarray(index.get_level_values('subject'), dtype=str),
+                 **{name: self.totals[name].to_numpy(dtype=np.float64) for name in TOTAL_COLUMNS})
+        os.replace(tmp_path, self.state_path)
+
+    def _load_state(self):
+        with np.load(self.state_path, allow_pickle=False) as state:
+            self.offset = int(state['offset'])
+            index = pd.MultiIndex.from_arrays(
+                [state['student_ids'], state['subjects'].astype(object)],
+                names=['student_id', 'subject'])
+            self.totals = pd.DataFrame({name: state[name] for name in TOTAL_COLUMNS}, index=index)
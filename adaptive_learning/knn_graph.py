@@ -0,0 +1,133 @@
+import os
+import numpy as np
+from joblib import Parallel, delayed, effective_n_jobs
+from scipy import sparse
+
+# Bump whenever the on-disk layout of a kNN graph changes
+KNN_GRAPH_VERSION = 1
+
+
+def _normalise(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+def tile_shape(n_vectors, k, max_memory_bytes, n_workers, max_columns=8192):
+    """
+    (row_block, column_block) sizes keeping every worker's tiles within budget.
+
+    A worker holds one row_block x column_block float64 tile plus about as
+    much again for the partial sort, so its share of max_memory_bytes fixes
+    the tile size, whatever n_vectors is.
+    """
+    column_block = max(1, min(n_vectors, max_columns))
+    per_worker = max_memory_bytes / max(1, n_workers)
+    row_block = int(per_worker // ((column_block + 2 * k) * 8 * 2))
+    if row_block < 1:
+        raise ValueError(f"max_memory_bytes={max_memory_bytes} is too small for "
+                         f"{n_workers} workers with {column_block}-column tiles")
+    return min(row_block, n_vectors), column_block
+
+
+def _top_k_block(vectors, start, stop, k, column_block):
+    """Each row's top-k (positions, similarities) over every column tile, for rows start:stop"""
+    rows = vectors[start:stop]
+    n_rows = len(rows)
+    best_positions = np.full((n_rows, 0), -1, dtype=np.int64)
+    best_similarities = np.empty((n_rows, 0))
+    row_numbers = np.arange(n_rows)[:, None]
+
+    for col_start in range(0, len(vectors), column_block):
+        col_stop = min(col_start + column_block, len(vectors))
+        tile = rows @ vectors[col_start:col_stop].T
+        # A row is never its own neighbour
+        overlap = np.arange(max(start, col_start), min(stop, col_stop))
+        tile[overlap - start, overlap - col_start] = -np.inf
+
+        # Cut the tile to its own top-k first, then merge with the running
+        # top-k, so the partial sort never copies a whole tile
+        if tile.shape[1] > k:
+            tile_top = np.argpartition(-tile, k - 1, axis=1)[:, :k]
+            tile = tile[row_numbers, tile_top]
+        else:
+            tile_top = np.broadcast_to(np.arange(tile.shape[1]), tile.shape)
+        positions = np.hstack([best_positions, tile_top + col_start])
+        similarities = np.hstack([best_similarities, tile])
+        if similarities.shape[1] > k:
+            keep = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+            positions = positions[row_numbers, keep]
+            similarities = similarities[row_numbers, keep]
+        best_positions, best_similarities = positions, similarities
+
+    order = np.argsort(-best_similarities, axis=1, kind='stable')
+    return best_positions[row_numbers, order], best_similarities[row_numbers, order]
+
+
+def build_knn_graph(vectors, ids, path, k=20, max_memory_bytes=256 * 1024 * 1024, n_jobs=-1):
+    """
+    Exact cosine kNN graph over all pairs of vectors, written to path (.npz).
+
+    Rows are processed in blocks, and each block streams over column tiles,
+    so the full N x N matrix never exists. Only every row's running top-k
+    survives a tile (np.argpartition). Row blocks run in parallel worker
+    processes. Peak memory is bounded by max_memory_bytes plus the
+    N x k result, independent of N^2.
+    """
+    vectors = _normalise(np.ascontiguousarray(vectors, dtype=np.float64))
+    ids = np.asarray(ids, dtype=np.int64)
+    n_vectors = len(vectors)
+    k = min(k, n_vectors - 1)
+    if k < 1:
+        raise ValueError("A kNN graph needs at least two vectors")
+    n_workers = effective_n_jobs(n_jobs)
+    row_block, column_block = tile_shape(n_vectors, k, max_memory_bytes, n_workers)
+
+    blocks = [(start, min(start + row_block, n_vectors)) for start in range(0, n_vectors, row_block)]
+    parts = Parallel(n_jobs=n_jobs)(
+        delayed(_top_k_block)(vectors, start, stop, k, column_block) for start, stop in blocks)
+
+    positions = np.vstack([part[0] for part in parts]) if parts else np.empty((0, k), dtype=np.int64)
+    similarities = np.vstack([part[1] for part in parts]) if parts else np.empty((0, k))
+    graph = sparse.csr_matrix(
+        (similarities.ravel().astype(np.float32), positions.ravel(),
+         np.arange(0, n_vectors * k + 1, k)),
+        shape=(n_vectors, n_vectors))
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    np.savez(path, version=np.array(KNN_GRAPH_VERSION), ids=ids,
+             data=graph.data, indices=graph.indices.astype(np.int32), indptr=graph.indptr, k=np.array(k))
+    print(f"kNN graph ({n_vectors} nodes, k={k}) written to {path} using "
+          f"{len(blocks)} blocks of {row_block} x {column_block}")
+    return KNNGraph(path)
+
+
+class KNNGraph:
+    """
+    Read side of build_knn_graph: neighbour lookups on a sparse CSR graph.
+
+    Row i holds node ids[i]'s k nearest neighbours, most similar first.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with np.load(path, allow_pickle=False) as stored:
+            if int(stored['version']) != KNN_GRAPH_VERSION:
+                raise ValueError(f"Unsupported kNN graph version in {path}: {int(stored['version'])}")
+            self.ids = stored['ids']
+            self.k = int(stored['k'])
+            self.graph = sparse.csr_matrix(
+                (stored['data'], stored['indices'], stored['indptr']),
+                shape=(len(self.ids), len(self.ids)))
+        self._id_position = {sid: i for i, sid in enumerate(self.ids.tolist())}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def neighbours(self, node_id, k=None):
+        """(ids, similarities) of a node's stored neighbours, most similar first"""
+        i = self._id_position.get(node_id)
+        if i is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        start, end = self.graph.indptr[i], self.graph.indptr[i + 1]
+        end = end if k is None else min(end, start + k)
+        return self.ids[self.graph.indices[start:end]], self.graph.data[start:end]
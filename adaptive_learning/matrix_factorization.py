@@ -0,0 +1,291 @@
+import glob
+import os
+import time
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from scipy import sparse
+from collaborative_filter import RatingPredictor
+from rating_matrix import RatingMatrix
+
+
+class ALSFactorizer(RatingPredictor):
+    """
+    Alternating-least-squares matrix factorisation of observed scores.
+
+    Scores are modelled as global_mean + student_factors @ item_factors.T and
+    fitted on observed entries only, so missing subjects no longer count as 0.
+    Each half-step builds every row's normal equations from its observed
+    entries (O(nnz * f^2)) and solves them as one batched np.linalg.solve per
+    block of rows; blocks run on a thread pool since LAPACK releases the GIL.
+    """
+
+    def __init__(self, n_factors=8, regularization=0.1, n_iterations=15,
+                 n_jobs=-1, block_size=4096, seed=42):
+        self.n_factors = n_factors
+        self.regularization = regularization
+        self.n_iterations = n_iterations
+        self.n_jobs = n_jobs
+        self.block_size = block_size
+        self.seed = seed
+        # Factors actually fitted: n_factors, capped by the data's shape
+        self.rank = None
+        self.ratings = None
+        self.observed = None
+        self.global_mean = None
+        self.student_factors = None
+        self.item_factors = None
+        self.training_rmse = []
+
+    def fit(self, ratings, weights=None, implicit=None):
+        """
+        Learn student and item factors from a RatingMatrix.
+
+        weights optionally scales each observed entry's squared error, e.g.
+        ImplicitFeedback.entry_weights(); it must share ratings.matrix's
+        sparsity structure. Without it every observed score counts once.
+
+        implicit optionally holds confidences for entries without a score,
+        e.g. ImplicitFeedback.unscored_confidence(). Each one joins the fit
+        as a pseudo-observation at its item's mean score, weighted by its
+        confidence, so engagement pulls the student towards the students who
+        score in that subject without inventing a score of its own.
+        """
+        self.ratings = ratings
+        self.observed = ratings.observed_mask()
+        matrix = ratings.matrix.astype(np.float64)
+        self.global_mean = float(matrix.data.mean()) if matrix.nnz else 0.0
+
+        residuals = matrix.copy()
+        residuals.data -= self.global_mean
+        if weights is None:
+            weights = ratings.observed_mask()
+        weights = sparse.csr_matrix(weights, dtype=np.float64)
+        if not (np.array_equal(weights.indptr, matrix.indptr)
+                and np.array_equal(weights.indices, matrix.indices)):
+            raise ValueError("weights must have the same sparsity structure as the ratings")
+        # RMSE is reported on the observed scores only
+        observed_residuals = residuals
+        if implicit is not None:
+            residuals, weights = self._with_implicit(residuals, weights, implicit, self.observed)
+        residuals_t = residuals.T.tocsr()
+        weights_t = weights.T.tocsr()
+
+        rng = np.random.default_rng(self.seed)
+        n_students, n_items = ratings.shape
+        # With as many factors as items every observed score is fitted exactly
+        # and the factors generalise nothing, so keep the rank below both sides
+        self.rank = max(1, min(self.n_factors, n_items - 1, n_students - 1))
+        self.student_factors = rng.normal(0, 0.1, (n_students, self.rank))
+        self.item_factors = rng.normal(0, 0.1, (n_items, self.rank))
+
+        self.training_rmse = []
+        for _ in range(self.n_iterations):
+            self.student_factors = self._solve(residuals, weights, self.item_factors)
+            self.item_factors = self._solve(residuals_t, weights_t, self.student_factors)
+            self.training_rmse.append(self._rmse(observed_residuals))
+
+        print(f"ALS fitted {n_students} students x {n_items} items with "
+              f"{self.rank} factors; training RMSE {self.training_rmse[-1]:.3f}")
+        return self
+
+    @staticmethod
+    def _with_implicit(residuals, weights, implicit, observed):
+        """Residuals and weights with the implicit entries merged in as extra observations"""
+        implicit = sparse.csr_matrix(implicit, dtype=np.float64)
+        # Entries with a score are already weighted through weights
+        implicit = sparse.csr_matrix(implicit - implicit.multiply(observed))
+        implicit.eliminate_zeros()
+        # Target: the item's mean residual over the students who have a score
+        counts = np.bincount(residuals.indices, minlength=residuals.shape[1])
+        sums = np.bincount(residuals.indices, weights=residuals.data, minlength=residuals.shape[1])
+        item_means = np.divide(sums, counts, out=np.zeros(residuals.shape[1]), where=counts > 0)
+
+        explicit = residuals.tocoo()
+        extra = implicit.tocoo()
+        rows = np.concatenate([explicit.row, extra.row])
+        cols = np.concatenate([explicit.col, extra.col])
+        order = np.lexsort((cols, rows))
+        indices = cols[order]
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=residuals.shape[0]))])
+        values = np.concatenate([explicit.data, item_means[extra.col]])[order]
+        entry_weights = np.concatenate([weights.tocoo().data, extra.data])[order]
+        return (sparse.csr_matrix((values, indices, indptr), shape=residuals.shape),
+                sparse.csr_matrix((entry_weights, indices.copy(), indptr.copy()), shape=residuals.shape))
+
+    def _solve(self, residuals, weights, fixed):
+        """Weighted least-squares update of every row of residuals against fixed factors"""
+        blocks = range(0, residuals.shape[0], self.block_size)
+        parts = Parallel(n_jobs=self.n_jobs, prefer='threads')(
+            delayed(self._solve_block)(residuals[start:start + self.block_size],
+                                       weights[start:start + self.block_size].data, fixed)
+            for start in blocks)
+        return np.vstack(parts) if parts else np.empty((0, fixed.shape[1]))
+
+    def _solve_block(self, block, entry_weights, fixed):
+        n_rows = block.shape[0]
+        counts = np.diff(block.indptr)
+        factors = np.zeros((n_rows, fixed.shape[1]))
+        has_data = counts > 0
+        if not has_data.any():
+            return factors
+
+        # Per-row normal equations summed over that row's observed entries.
+        # CSR rows are contiguous, so reduceat over non-empty row starts sums them.
+        starts = block.indptr[:-1][has_data]
+        neighbours = fixed[block.indices]
+        weighted = neighbours * entry_weights[:, None]
+        gram = np.add.reduceat(weighted[:, :, None] * neighbours[:, None, :], starts, axis=0)
+        rhs = np.add.reduceat(weighted * block.data[:, None], starts, axis=0)
+
+        # Weighted-lambda regularisation scales with each row's observation count
+        gram += (self.regularization * counts[has_data])[:, None, None] * np.eye(fixed.shape[1])
+        factors[has_data] = np.linalg.solve(gram, rhs[:, :, None])[:, :, 0]
+        return factors
+
+    def _rmse(self, residuals):
+        rows = np.repeat(np.arange(residuals.shape[0]), np.diff(residuals.indptr))
+        fitted = np.einsum('ij,ij->i', self.student_factors[rows], self.item_factors[residuals.indices])
+        return float(np.sqrt(np.mean((residuals.data - fitted) ** 2)))
+
+    def predict_rows(self, rows):
+        """Dense predicted scores (len(rows) x n_items) for rating-matrix row positions"""
+        predictions = self.global_mean + self.student_factors[rows] @ self.item_factors.T
+        return np.clip(predictions, 0, 100)
+
+    def complete_matrix(self):
+        """Student x item DataFrame: observed scores kept, the rest predicted"""
+        completed = self.ratings.to_dense()
+        predicted = np.vstack([self.predict_rows(np.arange(start, min(start + self.block_size, len(completed))))
+                               for start in range(0, len(completed), self.block_size)])
+        return completed.where(completed.notna(), predicted)
+
+    def save(self, path):
+        """Persist factors and index maps to a .npz file"""
+        np.savez(path,
+                 student_factors=self.student_factors,
+                 item_factors=self.item_factors,
+                 global_mean=np.array(self.global_mean),
+                 student_ids=self.ratings.student_ids,
+                 items=np.asarray(self.ratings.items, dtype=str),
+                 matrix_data=self.ratings.matrix.data,
+                 matrix_indices=self.ratings.matrix.indices,
+                 matrix_indptr=self.ratings.matrix.indptr,
+                 params=np.array([self.n_factors, self.regularization, self.n_iterations]))
+        print(f"ALS factors saved to {path}")
+        return path
+
+    @classmethod
+    def load(cls, path):
+        """Load a factorizer saved with save(); no refit needed"""
+        with np.load(path, allow_pickle=False) as bundle:
+            n_factors, regularization, n_iterations = bundle['params'].tolist()
+            model = cls(n_factors=int(n_factors), regularization=regularization,
+                        n_iterations=int(n_iterations))
+            model.student_factors = bundle['student_factors']
+            model.item_factors = bundle['item_factors']
+            model.rank = model.item_factors.shape[1]
+            model.global_mean = float(bundle['global_mean'])
+            items = bundle['items'].astype(object)
+            student_ids = bundle['student_ids']
+            matrix = sparse.csr_matrix(
+                (bundle['matrix_data'], bundle['matrix_indices'], bundle['matrix_indptr']),
+                shape=(len(student_ids), len(items)))
+        model.ratings = RatingMatrix(matrix, student_ids, items)
+        model.observed = model.ratings.observed_mask()
+        return model
+
+    def fold_in(self, scores):
+        """
+        Latent vector for a student outside the training data.
+
+        Solves the same regularised least-squares step as one ALS half-step,
+        against the frozen item factors, using only the given {item: score}
+        entries. Items the model has never seen are ignored.
+        """
+        positions = [self.ratings.item_index[item] for item in scores if item in self.ratings.item_index]
+        if not positions:
+            return np.zeros(self.rank)
+        values = np.array([scores[self.ratings.items[j]] for j in positions], dtype=np.float64)
+
+        item_factors = self.item_factors[positions]
+        gram = item_factors.T @ item_factors + self.regularization * len(positions) * np.eye(self.rank)
+        return np.linalg.solve(gram, item_factors.T @ (values - self.global_mean))
+
+    def predict_profile(self, scores):
+        """{item: predicted score} for every item, for a folded-in profile"""
+        predictions = np.clip(self.global_mean + self.item_factors @ self.fold_in(scores), 0, 100)
+        return dict(zip(self.ratings.items.tolist(), predictions.tolist()))
+
+    def recommend_profile(self, scores, n=5, exclude_observed=True, ascending=True):
+        """Ranked [(item, predicted score)] for a folded-in profile, lowest first by default"""
+        predictions = self.predict_profile(scores)
+        if exclude_observed:
+            predictions = {item: score for item, score in predictions.items() if item not in scores}
+        ranked = sorted(predictions.items(), key=lambda item: item[1], reverse=not ascending)
+        return ranked[:n]
+
+
+class RetrainQueue:
+    """
+    Append-only CSV of folded-in students' scores awaiting the next batch retrain.
+
+    Rows use the (student_id, subject, test_number, score) schema accepted by
+    DataProcessor.update_scores. A retrain claims the queue, refits, and only
+    then commits the claim; a failed retrain leaves the claimed rows in place
+    for the next attempt.
+    """
+
+    COLUMNS = ['student_id', 'subject', 'test_number', 'score']
+
+    def __init__(self, path):
+        self.path = path
+        self._claimed = []
+
+    def add(self, student_id, scores, test_number=1):
+        """Queue one student's {subject: score} entries"""
+        rows = pd.DataFrame({
+            'student_id': student_id,
+            'subject': list(scores.keys()),
+            'test_number': test_number,
+            'score': list(scores.values())
+        }, columns=self.COLUMNS)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        rows.to_csv(self.path, mode='a', index=False, header=not os.path.exists(self.path))
+        return len(rows)
+
+    def _claimed_files(self):
+        return sorted(glob.glob(glob.escape(self.path) + '.*.claimed'))
+
+    @staticmethod
+    def _read(paths):
+        frames = [pd.read_csv(path) for path in paths]
+        if not frames:
+            return pd.DataFrame(columns=RetrainQueue.COLUMNS)
+        return pd.concat(frames, ignore_index=True)
+
+    def pending(self):
+        """Queued rows, claimed or not, without removing them"""
+        paths = self._claimed_files()
+        if os.path.exists(self.path):
+            paths.append(self.path)
+        return self._read(paths)
+
+    def claim(self):
+        """Set the queued rows aside for a retrain and return them
+
+        The queue file is renamed before it is read, so rows added meanwhile
+        start a new queue instead of being lost. Claims left by a failed
+        retrain are picked up again. Nothing is deleted until commit().
+        """
+        if os.path.exists(self.path):
+            os.replace(self.path, f"{self.path}.{time.time_ns()}.claimed")
+        self._claimed = self._claimed_files()
+        return self._read(self._claimed)
+
+    def commit(self):
+        """Delete the rows returned by the last claim(), once they are stored"""
+        for path in self._claimed:
+            if os.path.exists(path):
+                os.remove(path)
+        self._claimed = []
@@ -0,0 +1,86 @@
+import hashlib
+from datetime import datetime
+import joblib
+import numpy as np
+import pandas as pd
+
+# Bump whenever the bundle's layout changes
+ARTIFACT_VERSION = 1
+
+
+def data_fingerprint(frame):
+    """Short content hash of a DataFrame (values and index)"""
+    hashes = pd.util.hash_pandas_object(frame, index=True).to_numpy()
+    return hashlib.sha1(hashes.tobytes()).hexdigest()[:16]
+
+
+class ModelArtifact:
+    """
+    Versioned, self-describing bundle around the performance-tier model.
+
+    Alongside the fitted estimator it stores the feature columns in
+    training order, the tier labels, a fingerprint of the training data,
+    evaluation metrics, hyperparameters and the training time. Everything
+    prediction needs is in the file, so serving never touches the dataset.
+    train_ids, when known, are the student IDs any of the model's trees
+    were fitted on.
+    """
+
+    def __init__(self, model, feature_columns, tier_labels=None, data_fingerprint=None,
+                 metrics=None, params=None, trained_at=None, train_ids=None):
+        self.model = model
+        self.feature_columns = list(feature_columns)
+        self.tier_labels = list(tier_labels if tier_labels is not None else model.classes_)
+        self.data_fingerprint = data_fingerprint
+        self.metrics = metrics or {}
+        self.params = params or {}
+        self.trained_at = trained_at or datetime.now().isoformat(timespec='seconds')
+        self.train_ids = None if train_ids is None else np.asarray(train_ids, dtype=np.int64)
+
+    def metadata(self):
+        """Everything but the estimator, as plain Python values"""
+        return {
+            'version': ARTIFACT_VERSION,
+            'model_type': type(self.model).__name__,
+            'feature_columns': self.feature_columns,
+            'tier_labels': self.tier_labels,
+            'data_fingerprint': self.data_fingerprint,
+            'metrics': self.metrics,
+            'params': self.params,
+            'trained_at': self.trained_at
+        }
+
+    def save(self, path):
+        """Write the bundle with joblib"""
+        joblib.dump({'metadata': self.metadata(), 'model': self.model,
+                     'train_ids': self.train_ids}, path)
+        print(f"Model artifact saved to {path}")
+        return path
+
+    @classmethod
+    def load(cls, path):
+        """Load a bundle written by save()"""
+        bundle = joblib.load(path)
+        metadata = bundle.get('metadata', {}) if isinstance(bundle, dict) else {}
+        if metadata.get('version') != ARTIFACT_VERSION:
+            raise ValueError(f"Unsupported model artifact version in {path}: {metadata.get('version')}")
+        # Bundles saved before train_ids were recorded load without them
+        return cls(bundle['model'], metadata['feature_columns'], metadata['tier_labels'],
+                   metadata['data_fingerprint'], metadata['metrics'], metadata['params'],
+                   metadata['trained_at'], bundle.get('train_ids'))
+
+    def predict(self, student_data):
+        """Tiers for a DataFrame or a {feature: value} dict; missing features count as 0"""
+        if isinstance(student_data, dict):
+            row = np.array([[student_data.get(col, 0) for col in self.feature_columns]], dtype=np.float64)
+            student_data = pd.DataFrame(row, columns=self.feature_columns)
+        else:
+            student_data = student_data.reindex(columns=self.feature_columns, fill_value=0)
+        return self.model.predict(student_data)
+
+    def feature_importance(self):
+        """Features sorted by the model's importance"""
+        return pd.DataFrame({
+            'feature': self.feature_columns,
+            'importance': self.model.feature_importances_
+        }).sort_values('importance', ascending=False)
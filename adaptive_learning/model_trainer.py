@@ -3,21 +3,86 @@ import numpy as np
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score, precision_score, recall_score, classification_report
 from sklearn.model_selection import GridSearchCV
+from sklearn.base import clone
 import joblib
+import json
 import os
-from data_processor import DataProcessor
+import threading
+import time
+from datetime import datetime
+from data_context import DataContext
+from feature_store import FeatureStore
+from collaborative_filter import ItemItemCF
+from matrix_factorization import ALSFactorizer, RetrainQueue
+from batch_recommender import BatchRecommender
+from interaction_log import InteractionLog, ImplicitFeedback
+from cohort_clusters import CohortClusters
+from evaluation import RecommenderEvaluator
+from hyperparameter_search import SuccessiveHalvingSearch
+from model_artifact import ModelArtifact, data_fingerprint
+from similarity_cache import ratings_fingerprint
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+ARTIFACT_PATH = os.path.join(MODEL_DIR, 'performance_model.joblib')
+# Bare estimator dump from before model artifacts; still loaded if nothing newer exists
+LEGACY_MODEL_PATH = os.path.join(MODEL_DIR, 'performance_predictor.pkl')
+INTERACTION_LOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                    'interactions', 'events.csv')
+# Next free ID for profiles entered in the app, persisted so IDs are never reissued
+STUDENT_ID_COUNTER_PATH = os.path.join(MODEL_DIR, 'next_student_id.json')
+_student_id_lock = threading.Lock()
+# Warm-start refits tried before accepting new trees whose seeds collide with old ones
+MAX_RESEED_ATTEMPTS = 10
 
 class ModelTrainer:
-    def __init__(self, file_path):
+    def __init__(self, file_path, context=None, feature_store=None):
         self.file_path = file_path
+        # Optional FeatureStore; read paths use it until the dataset is loaded
+        self.feature_store = feature_store
         self.model = None
+        self.artifact = None
         self.best_params = None
-        self.processor = DataProcessor(file_path)
+        # Share loaded/preprocessed data with the other pipeline stages
+        self.context = context or DataContext.shared(file_path)
+        self.processor = self.context.processor
+        self.item_cf = None
+        self._item_cf_version = None
+        self.factor_model = None
+        self.cohort_clusters = None
+        # Students folded into the factor model wait here for the next retrain
+        self.retrain_queue = RetrainQueue(os.path.join(MODEL_DIR, 'retrain_queue.csv'))
+        # Engagement logged by the app, aggregated incrementally between retrains
+        self.implicit_feedback = ImplicitFeedback(
+            InteractionLog(INTERACTION_LOG_PATH),
+            state_path=os.path.join(MODEL_DIR, 'implicit_feedback.npz'))
+        
+    def _uses_feature_store(self):
+        return self.feature_store is not None and self.processor.processed_data is None
+    
+    def _student_matrix(self):
+        """processed_data, from the feature store while the dataset is not loaded"""
+        if self._uses_feature_store():
+            return self.feature_store.to_frame()
+        return self.context.processed_data
+    
+    def _rating_matrix(self):
+        """Observed scores, from the feature store while the dataset is not loaded"""
+        if self._uses_feature_store():
+            return self.feature_store.rating_matrix()
+        return self.processor.get_rating_matrix()
+    
+    def train_model(self, sparse_features=False, search='quick', time_budget=None, n_jobs=-1):
+        """Train the RandomForest model with hyperparameter tuning
         
-    def train_model(self):
-        """Train the RandomForest model with hyperparameter tuning"""
+        search='quick' grid-searches the single quick_param_grid point;
+        search='halving' runs successive halving over the full param_grid
+        within time_budget seconds on n_jobs workers, saving the trials to
+        models/search_history.json.
+        """
+        if search not in ('quick', 'halving'):
+            raise ValueError(f"Unknown search mode: {search}")
         # Get processed data
-        X_train, X_test, y_train, y_test = self.processor.split_data()
+        X_train, X_test, y_train, y_test = self.context.split_data(sparse_features=sparse_features)
         
         print("Starting model training...")
         
@@ -41,20 +106,34 @@ class ModelTrainer:
         }
         
         print("Performing hyperparameter tuning...")
-        # Perform GridSearch with cross-validation
-        grid_search = GridSearchCV(
-            estimator=rf,
-            param_grid=quick_param_grid,  # Use quick_param_grid for faster results
-            cv=5,
-            scoring='accuracy',
-            n_jobs=-1
-        )
-        
-        grid_search.fit(X_train, y_train)
-        
-        # Get best model and parameters
-        self.model = grid_search.best_estimator_
-        self.best_params = grid_search.best_params_
+        started = time.perf_counter()
+        if search == 'halving':
+            # Only surviving configurations get more rows and trees
+            halving = SuccessiveHalvingSearch(
+                rf, param_grid, time_budget=time_budget, n_jobs=n_jobs,
+                history_path=os.path.join(MODEL_DIR, 'search_history.json'))
+            halving.fit(X_train, y_train)
+            self.best_params = halving.best_params_
+            refit_started = time.perf_counter()
+            self.model = clone(rf).set_params(**self.best_params).fit(X_train, y_train)
+            refit_seconds = time.perf_counter() - refit_started
+        else:
+            # Perform GridSearch with cross-validation
+            grid_search = GridSearchCV(
+                estimator=rf,
+                param_grid=quick_param_grid,  # Use quick_param_grid for faster results
+                cv=5,
+                scoring='accuracy',
+                n_jobs=n_jobs
+            )
+            
+            grid_search.fit(X_train, y_train)
+            
+            # Get best model and parameters
+            self.model = grid_search.best_estimator_
+            self.best_params = grid_search.best_params_
+            refit_seconds = grid_search.refit_time_
+        fit_seconds = time.perf_counter() - started
         
         # Evaluate model
         y_pred = self.model.predict(X_test)
@@ -72,75 +151,325 @@ class ModelTrainer:
         print("\nClassification Report:")
         print(classification_report(y_test, y_pred))
         
+        # Bundle the model with everything prediction needs
+        self.artifact = ModelArtifact(
+            self.model, self.context.feature_columns,
+            data_fingerprint=data_fingerprint(self.context.processed_data),
+            metrics={'accuracy': accuracy, 'precision': precision, 'recall': recall},
+            params=self.best_params, train_ids=X_train.index.to_numpy())
+        
         # Get feature importance
         feature_importance = self.get_feature_importance()
         print("\nFeature Importance:")
         print(feature_importance.head(10))
         
-        # Create model directory if it doesn't exist
-        model_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
-        os.makedirs(model_dir, exist_ok=True)
-        
         # Save the model
-        model_path = os.path.join(model_dir, 'performance_predictor.pkl')
-        joblib.dump(self.model, model_path)
-        print(f"Model saved to {model_path}")
+        os.makedirs(MODEL_DIR, exist_ok=True)
+        self.artifact.save(ARTIFACT_PATH)
+        self._log_training('full', fit_seconds, accuracy, refit_seconds=refit_seconds)
         
         return accuracy
     
-    def predict_performance(self, student_data):
-        """Predict performance tier for new student data"""
-        if self.model is None:
-            model_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 
-                                      'models', 'performance_predictor.pkl')
-            if os.path.exists(model_path):
-                self.model = joblib.load(model_path)
-            else:
-                print("Model not found. Training a new model...")
-                self.train_model()
+    def _log_training(self, mode, fit_seconds, accuracy, refit_seconds=None):
+        """Append a run to models/training_history.json
+        
+        For full runs fit_seconds covers the whole search and refit_seconds
+        the final fit of the chosen configuration alone.
+        """
+        history_path = os.path.join(MODEL_DIR, 'training_history.json')
+        history = self.training_history()
+        run = {
+            'mode': mode,
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'fit_seconds': fit_seconds,
+            'accuracy': accuracy,
+            'n_estimators': len(self.model.estimators_)
+        }
+        if refit_seconds is not None:
+            run['refit_seconds'] = refit_seconds
+        history.append(run)
+        os.makedirs(MODEL_DIR, exist_ok=True)
+        with open(history_path, 'w') as f:
+            json.dump(history, f, indent=2)
+    
+    def training_history(self):
+        """Past full and incremental training runs, oldest first"""
+        history_path = os.path.join(MODEL_DIR, 'training_history.json')
+        if not os.path.exists(history_path):
+            return []
+        with open(history_path) as f:
+            return json.load(f)
+    
+    def retrain_incremental(self, new_results=None, n_new_trees=50, max_trees=None):
+        """Grow extra trees on the saved model instead of refitting from scratch
+        
+        new_results (raw student_id/subject/test_number/score rows) are folded
+        into the data first. The saved forest is loaded and n_new_trees are
+        added with warm_start on the current training split; with max_trees
+        set, the oldest trees beyond that count are retired. Falls back to a
+        full train_model() when there is no saved model or the tier labels
+        have changed, since warm-started trees must share the label encoding.
+        """
+        if not os.path.exists(ARTIFACT_PATH) and not os.path.exists(LEGACY_MODEL_PATH):
+            print("No saved model to warm-start from. Running a full training...")
+            return self.train_model()
+        
+        if new_results is not None and len(new_results):
+            self.context.update_scores(new_results)
+        X_train, X_test, y_train, y_test = self.context.split_data()
+        
+        artifact = self.load_artifact()
+        model = artifact.model
+        if set(np.unique(y_train)) != set(model.classes_):
+            print("Performance tiers changed since the last training. Running a full training...")
+            return self.train_model()
+        
+        # Before/after accuracy is compared on test rows none of the saved
+        # trees were fitted on; the new split can include students they saw
+        previous_train_ids = artifact.train_ids
+        if previous_train_ids is None:
+            print("The saved model does not record its training students; "
+                  "skipping the before/after accuracy comparison")
+            unseen = np.zeros(len(X_test), dtype=bool)
+        else:
+            unseen = ~X_test.index.isin(previous_train_ids)
+        previous_accuracy = (accuracy_score(y_test[unseen], model.predict(X_test[unseen]))
+                             if unseen.any() else None)
+        
+        started = time.perf_counter()
+        # warm_start seeds new trees by skipping one draw per existing tree, so
+        # once old trees are retired the same random_state would hand out seeds
+        # that trees still in the forest already used. Each run takes the next
+        # random_state instead (kept in the saved model), and the rare seed
+        # collision between streams is refitted under the one after, a
+        # bounded number of times.
+        existing = list(model.estimators_)
+        seed = model.random_state if isinstance(model.random_state, (int, np.integer)) else 0
+        for _ in range(MAX_RESEED_ATTEMPTS):
+            seed += 1
+            model.estimators_ = list(existing)
+            model.set_params(warm_start=True, n_estimators=len(existing) + n_new_trees,
+                             random_state=seed)
+            model.fit(X_train, y_train)
+            tree_seeds = [tree.random_state for tree in model.estimators_]
+            if len(set(tree_seeds)) == len(tree_seeds):
+                break
+        else:
+            print(f"New trees still share seeds with existing ones after "
+                  f"{MAX_RESEED_ATTEMPTS} attempts; keeping the last fit")
+        if max_trees is not None and len(model.estimators_) > max_trees:
+            # Trees are appended in training order, so the oldest come first
+            model.estimators_ = model.estimators_[-max_trees:]
+            model.n_estimators = max_trees
+        fit_seconds = time.perf_counter() - started
+        
+        self.model = model
+        accuracy = accuracy_score(y_test, model.predict(X_test))
+        self.artifact = ModelArtifact(
+            model, self.context.feature_columns,
+            data_fingerprint=data_fingerprint(self.context.processed_data),
+            metrics={'accuracy': accuracy}, params=model.get_params(),
+            train_ids=(None if previous_train_ids is None
+                       else np.union1d(previous_train_ids, X_train.index.to_numpy())))
+        self.artifact.save(ARTIFACT_PATH)
         
-        # Ensure student_data has the same features as training data
-        X, _ = self.processor.get_features_and_labels()
-        for col in X.columns:
-            if col not in student_data.columns:
-                student_data[col] = 0
+        # Older history entries only timed the whole search, which is no fair baseline
+        full_refits = [run['refit_seconds'] for run in self.training_history()
+                       if run['mode'] == 'full' and 'refit_seconds' in run]
+        print(f"\nIncremental retrain: +{n_new_trees} trees, {len(model.estimators_)} in the forest")
+        print(f"Fit time: {fit_seconds:.2f}s")
+        if full_refits:
+            saved = full_refits[-1] - fit_seconds
+            print(f"Time saved vs last full refit: {saved:.2f}s ({full_refits[-1]:.2f}s full)")
+        print(f"Accuracy: {accuracy:.4f} on {len(y_test)} test rows")
+        if previous_accuracy is not None:
+            unseen_accuracy = accuracy_score(y_test[unseen], model.predict(X_test[unseen]))
+            print(f"Accuracy on {int(unseen.sum())} rows neither model trained on: "
+                  f"{previous_accuracy:.4f} -> {unseen_accuracy:.4f} "
+                  f"({unseen_accuracy - previous_accuracy:+.4f})")
+        self._log_training('incremental', fit_seconds, accuracy)
         
-        # Keep only columns used for training
-        student_data = student_data[X.columns]
+        return accuracy
+    
+    def load_artifact(self):
+        """The saved model artifact, training a new model if none exists
         
-        return self.model.predict(student_data)
+        A bare legacy performance_predictor.pkl is wrapped on the fly; only
+        that path needs the student matrix (the feature store, if set), to
+        recover the feature columns.
+        """
+        if self.artifact is None:
+            if os.path.exists(ARTIFACT_PATH):
+                self.artifact = ModelArtifact.load(ARTIFACT_PATH)
+            elif os.path.exists(LEGACY_MODEL_PATH):
+                feature_columns = list(self._student_matrix().columns.drop('performance_tier'))
+                # The file's mtime stands in for the training time, so it stays stable across loads
+                trained_at = datetime.fromtimestamp(os.path.getmtime(LEGACY_MODEL_PATH))
+                self.artifact = ModelArtifact(joblib.load(LEGACY_MODEL_PATH), feature_columns,
+                                              trained_at=trained_at.isoformat(timespec='seconds'))
+            else:
+                print("Model not found. Training a new model...")
+                self.train_model()
+            self.model = self.artifact.model
+        return self.artifact
+    
+    def predict_performance(self, student_data):
+        """Predict performance tier for new student data"""
+        return self.load_artifact().predict(student_data)
     
     def get_feature_importance(self):
         """Get feature importance from the trained model"""
-        if self.model is None:
-            model_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 
-                                      'models', 'performance_predictor.pkl')
+        return self.load_artifact().feature_importance()
+    
+    def get_item_cf(self, **cf_params):
+        """Item-item CF engine fitted on the current rating matrix, refitted when data changes"""
+        version = self.processor.data_version
+        if self.item_cf is None or self._item_cf_version != version or cf_params:
+            self.item_cf = ItemItemCF(**cf_params).fit(self.processor.get_rating_matrix())
+            self._item_cf_version = self.processor.data_version
+        return self.item_cf
+    
+    def get_factor_model(self):
+        """ALS factor model, loaded from models/ if saved and current, else trained and saved
+        
+        The saved factors carry the ratings they were fitted on; if those
+        differ from the current ratings the model is refitted.
+        """
+        if self.factor_model is None:
+            model_path = os.path.join(MODEL_DIR, 'als_factors.npz')
             if os.path.exists(model_path):
-                self.model = joblib.load(model_path)
-            else:
-                print("Model not found. Training a new model...")
-                self.train_model()
+                saved = ALSFactorizer.load(model_path)
+                if ratings_fingerprint(saved.ratings) == ratings_fingerprint(self._rating_matrix()):
+                    self.factor_model = saved
+                else:
+                    print("Saved ALS factors do not match the current ratings; refitting")
+            if self.factor_model is None:
+                self.factor_model = self.retrain_factor_model()
+        return self.factor_model
+    
+    def retrain_factor_model(self, implicit_alpha=0.5, **als_params):
+        """Fold queued students into the data, refit ALS and save the factors
         
-        # Get feature names and importance values
-        X, _ = self.processor.get_features_and_labels()
-        feature_names = X.columns
+        Scores in subjects a student has engaged with in the app (enrolments,
+        completed lessons, progress) are weighted up by implicit_alpha per
+        unit of engagement, and engagement in subjects without a score enters
+        as a confidence-weighted implicit term; 0 ignores engagement.
+        """
+        # The claimed rows are only stored for good once the new factors are saved
+        queued = self.retrain_queue.claim()
+        if len(queued):
+            print(f"Including {len(queued)} queued results in the retrain")
+            self.context.update_scores(queued, persist=False)
         
-        feature_importance = pd.DataFrame({
-            'feature': feature_names,
-            'importance': self.model.feature_importances_
-        }).sort_values('importance', ascending=False)
+        ratings = self._rating_matrix()
+        new_events = self.implicit_feedback.refresh()
+        if new_events:
+            print(f"Aggregated {new_events} new interaction events")
+        weights, implicit = None, None
+        if implicit_alpha and len(self.implicit_feedback.totals):
+            weights = self.implicit_feedback.entry_weights(ratings, alpha=implicit_alpha)
+            implicit = self.implicit_feedback.unscored_confidence(ratings, alpha=implicit_alpha)
+            if self.implicit_feedback.unmatched:
+                print(f"{self.implicit_feedback.unmatched} engaged (student, subject) pairs "
+                      f"are not in the ratings yet")
+        self.factor_model = ALSFactorizer(**als_params).fit(ratings, weights=weights, implicit=implicit)
+        os.makedirs(MODEL_DIR, exist_ok=True)
+        self.factor_model.save(os.path.join(MODEL_DIR, 'als_factors.npz'))
+        if len(queued):
+            self.processor.persist_results(queued)
+            if self.feature_store is not None:
+                # Later processes read students from the store, so it must include these
+                self.context.write_feature_store(self.feature_store.path)
+                self.feature_store = FeatureStore.open(self.feature_store.path)
+        self.retrain_queue.commit()
+        return self.factor_model
+    
+    def new_student_id(self):
+        """Fresh numeric ID for a profile entered outside the dataset
+        
+        IDs start above every student the factor model was fitted on and
+        are never handed out twice, so the queued scores and logged events
+        of app profiles cannot merge into an existing student's.
+        """
+        with _student_id_lock:
+            next_id = int(self.get_factor_model().ratings.student_ids.max()) + 1
+            if os.path.exists(STUDENT_ID_COUNTER_PATH):
+                with open(STUDENT_ID_COUNTER_PATH) as f:
+                    next_id = max(next_id, json.load(f)['next_id'])
+            os.makedirs(MODEL_DIR, exist_ok=True)
+            with open(STUDENT_ID_COUNTER_PATH + '.tmp', 'w') as f:
+                json.dump({'next_id': next_id + 1}, f)
+            os.replace(STUDENT_ID_COUNTER_PATH + '.tmp', STUDENT_ID_COUNTER_PATH)
+        return next_id
+    
+    def fold_in_student(self, scores, student_id=None):
+        """Recommendations for a new student without retraining; queue them for the next retrain"""
+        model = self.get_factor_model()
+        if student_id is not None:
+            self.retrain_queue.add(student_id, scores)
+        return model.predict_profile(scores)
+    
+    def score_recommendations(self, recommender=None, k=5, n_jobs=-1):
+        """Precompute every student's top-k course modules to models/top_k_recommendations.npz
         
-        return feature_importance
+        recommender (defaults to the factor model) fills in subjects a student
+        has no results in; the app then serves the file by lookup.
+        """
+        recommender = recommender or self.get_factor_model()
+        batch = BatchRecommender(recommender, k=k, n_jobs=n_jobs)
+        return batch.run(recommender.ratings, os.path.join(MODEL_DIR, 'top_k_recommendations.npz'))
     
-    def generate_course_recommendation(self, student_id=None, student_data=None):
-        """Generate personalized course recommendations for a student"""
+    def evaluate_recommenders(self, backends=None, holdout_tests=1, k=None):
+        """Compare recommender backends on a holdout of each student's latest tests
+        
+        k defaults to one below the number of subjects, the largest cut-off
+        at which the ranking metrics still measure ordering.
+        """
+        evaluator = RecommenderEvaluator(self.context.df, holdout_tests=holdout_tests, k=k)
+        results = evaluator.evaluate(backends)
+        print("\nRecommender Evaluation:")
+        print(results.round(4).to_string())
+        return results
+    
+    def get_cohort_clusters(self, refit=False, **cluster_params):
+        """Cohort clusters with per-cluster course bundles, loaded from models/ if saved
+        
+        Saved clusters are refitted when the student matrix or the tier
+        model (by its trained_at) has changed since they were fitted.
+        """
+        clusters_path = os.path.join(MODEL_DIR, 'cohort_clusters.json')
+        student_matrix = self._student_matrix()
+        model_version = self.load_artifact().trained_at
+        if self.cohort_clusters is None and not refit and os.path.exists(clusters_path):
+            saved = CohortClusters.load(clusters_path)
+            if (saved.data_version == data_fingerprint(student_matrix)
+                    and saved.model_version == model_version):
+                self.cohort_clusters = saved
+            else:
+                print("Saved cohort clusters are out of date; refitting")
+        if self.cohort_clusters is None or refit:
+            self.cohort_clusters = CohortClusters(**cluster_params).fit(
+                student_matrix, predict_tier=self.predict_performance, model_version=model_version)
+            self.cohort_clusters.save(clusters_path)
+        return self.cohort_clusters
+    
+    def generate_course_recommendation(self, student_id=None, student_data=None, recommender=None):
+        """Generate personalized course recommendations for a student
+        
+        recommender is an optional engine with predict_student(student_id)
+        (e.g. get_item_cf()). Its predicted scores replace the 0 placeholders
+        of subjects the student has no results in, and courses are then
+        ranked from the lowest (predicted) score up.
+        """
         if student_data is None and student_id is not None:
-            # Get student data from the processor
-            processed_data = self.processor.preprocess_data()
-            if student_id not in processed_data.index:
+            # Get student data from the indexed snapshot of the processed data
+            if self._uses_feature_store():
+                student_data = self.feature_store.get_student(student_id)
+            else:
+                student_data = self.context.student_index.get(student_id)
+            if student_data is None:
                 print(f"Student ID {student_id} not found in the dataset.")
                 return None
-            student_data = processed_data.loc[student_id].to_dict()
         
         if student_data is None:
             print("No student data provided.")
@@ -150,18 +479,22 @@ class ModelTrainer:
         subject_cols = [col for col in student_data.keys() 
                        if col not in ['average_score', 'performance_tier', 'time_spent']]
         
-        # Convert to DataFrame for easier manipulation
-        if not isinstance(student_data, pd.DataFrame):
-            student_df = pd.DataFrame([student_data])
-        else:
-            student_df = student_data
-            
         # Get scores for each subject
-        subject_scores = {subj: student_df[subj].values[0] 
-                         for subj in subject_cols if subj in student_df.columns}
+        if isinstance(student_data, pd.DataFrame):
+            subject_scores = {subj: student_data[subj].values[0] 
+                             for subj in subject_cols if subj in student_data.columns}
+        else:
+            subject_scores = {subj: student_data[subj] for subj in subject_cols}
+        
+        predicted_subjects = {}
+        if recommender is not None and student_id is not None:
+            predicted_subjects = recommender.predict_student(student_id)
+            subject_scores.update(predicted_subjects)
         
         # Identify weakest subjects (below 60 score)
         weak_subjects = {subj: score for subj, score in subject_scores.items() if score < 60}
+        if recommender is not None:
+            weak_subjects = dict(sorted(weak_subjects.items(), key=lambda item: item[1]))
         
         # Generate recommendations
         recommendations = []
@@ -185,6 +518,8 @@ class ModelTrainer:
                 "duration_weeks": 4 if score < 40 else (3 if score < 60 else 2),
                 "interactive_tools": ["flashcards", "quizzes", "practice problems"]
             }
+            if recommender is not None:
+                course["score_is_predicted"] = subject in predicted_subjects
             recommendations.append(course)
         
         return recommendations
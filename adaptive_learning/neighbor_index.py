@@ -0,0 +1,188 @@
+import time
+from collections import deque
+import numpy as np
+
+
+class LSHIndex:
+    """
+    Approximate cosine nearest-neighbour index using random-projection LSH.
+
+    Each of n_tables hash tables signs n_bits random hyperplanes, so vectors
+    pointing the same way tend to share a bucket. A query gathers the
+    candidates from its bucket in every table (plus n_probes neighbouring
+    buckets, flipping the least certain bits) and ranks only those exactly.
+    More tables or probes raise recall; more bits shrink buckets and latency.
+
+    Each table's codes are kept sorted so a bucket is a binary search. New
+    vectors go into a small unsorted buffer that is merged once it grows.
+    """
+
+    def __init__(self, dim, n_tables=8, n_bits=12, n_probes=2, seed=42, merge_threshold=4096):
+        if n_bits > 62:
+            raise ValueError("n_bits must fit in a signed 64-bit code")
+        self.dim = dim
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.n_probes = n_probes
+        self.merge_threshold = merge_threshold
+
+        rng = np.random.default_rng(seed)
+        self.planes = rng.standard_normal((n_tables, n_bits, dim))
+        self._bit_weights = 1 << np.arange(n_bits, dtype=np.int64)
+
+        # Storage grows by doubling so single inserts stay amortised O(1)
+        self._size = 0
+        self._ids = np.empty(0, dtype=np.int64)
+        self._vectors = np.empty((0, dim), dtype=np.float64)
+        self._sorted_codes = np.empty((n_tables, 0), dtype=np.int64)
+        self._sorted_positions = np.empty((n_tables, 0), dtype=np.int64)
+        self._pending = np.empty(0, dtype=np.int64)
+        self._id_position = {}
+        # Most recent query latencies, in seconds
+        self.query_times = deque(maxlen=10000)
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def ids(self):
+        return self._ids[:self._size]
+
+    @property
+    def vectors(self):
+        return self._vectors[:self._size]
+
+    def _reserve(self, extra):
+        needed = self._size + extra
+        if needed <= len(self._ids):
+            return
+        capacity = max(needed, 2 * len(self._ids), 1024)
+        ids = np.empty(capacity, dtype=np.int64)
+        vectors = np.empty((capacity, self.dim), dtype=np.float64)
+        ids[:self._size] = self.ids
+        vectors[:self._size] = self.vectors
+        self._ids, self._vectors = ids, vectors
+
+    @staticmethod
+    def _normalise(vectors):
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+    def _project(self, vectors):
+        """(n_tables, n, n_bits) projections onto every table's hyperplanes"""
+        return np.einsum('tbd,nd->tnb', self.planes, vectors)
+
+    def _codes(self, projections):
+        return (projections > 0).astype(np.int64) @ self._bit_weights
+
+    def add(self, vectors, ids):
+        """Insert vectors under the given ids; cheap enough to call per new student"""
+        vectors = self._normalise(np.atleast_2d(np.asarray(vectors, dtype=np.float64)))
+        ids = np.atleast_1d(np.asarray(ids, dtype=np.int64))
+        start = self._size
+
+        self._reserve(len(ids))
+        self._vectors[start:start + len(ids)] = vectors
+        self._ids[start:start + len(ids)] = ids
+        self._size += len(ids)
+        for offset, sid in enumerate(ids.tolist()):
+            self._id_position[sid] = start + offset
+        self._pending = np.concatenate([self._pending, np.arange(start, start + len(ids))])
+
+        if len(self._pending) >= max(self.merge_threshold, self._sorted_codes.shape[1] // 20):
+            self._merge_pending()
+        return self
+
+    def flush(self):
+        """Merge buffered inserts now, e.g. right after a bulk build"""
+        self._merge_pending()
+        return self
+
+    def position(self, student_id):
+        """Storage position of an indexed id, or None"""
+        return self._id_position.get(student_id)
+
+    def _merge_pending(self):
+        """Fold buffered inserts into the sorted per-table code arrays"""
+        if len(self._pending) == 0:
+            return
+        codes = self._codes(self._project(self.vectors[self._pending]))
+        all_codes = np.concatenate([self._sorted_codes, codes], axis=1)
+        all_positions = np.concatenate(
+            [self._sorted_positions, np.broadcast_to(self._pending, codes.shape)], axis=1)
+        order = np.argsort(all_codes, axis=1, kind='stable')
+        self._sorted_codes = np.take_along_axis(all_codes, order, axis=1)
+        self._sorted_positions = np.take_along_axis(all_positions, order, axis=1)
+        self._pending = np.empty(0, dtype=np.int64)
+
+    def _probe_codes(self, projections):
+        """Bucket codes to visit per table: the home bucket plus flipped-bit neighbours"""
+        home = self._codes(projections)
+        probes = [home[:, None]]
+        if self.n_probes > 0:
+            # Flip the bits whose hyperplane the query lies closest to
+            flip = np.argsort(np.abs(projections), axis=-1)[..., :self.n_probes]
+            probes.append(home[:, None] ^ self._bit_weights[flip])
+        return np.concatenate(probes, axis=1)
+
+    def _candidates(self, vector):
+        projections = self._project(vector[None, :])[:, 0, :]
+        probe_codes = self._probe_codes(projections)
+        found = []
+        for t in range(self.n_tables):
+            codes = self._sorted_codes[t]
+            lo = np.searchsorted(codes, probe_codes[t], side='left')
+            hi = np.searchsorted(codes, probe_codes[t], side='right')
+            for a, b in zip(lo.tolist(), hi.tolist()):
+                if b > a:
+                    found.append(self._sorted_positions[t, a:b])
+        if len(self._pending):
+            # Recent inserts are few; check them exhaustively
+            found.append(self._pending)
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(found))
+
+    def query(self, vector, k=10, exclude_id=None):
+        """(ids, cosine similarities) of up to k approximate nearest neighbours"""
+        started = time.perf_counter()
+        vector = self._normalise(np.asarray(vector, dtype=np.float64))
+        candidates = self._candidates(vector)
+        if exclude_id is not None and exclude_id in self._id_position:
+            candidates = candidates[candidates != self._id_position[exclude_id]]
+
+        similarities = self.vectors[candidates] @ vector
+        if len(candidates) > k:
+            top = np.argpartition(-similarities, k - 1)[:k]
+            candidates, similarities = candidates[top], similarities[top]
+        order = np.argsort(-similarities, kind='stable')
+
+        self.query_times.append(time.perf_counter() - started)
+        return self.ids[candidates[order]], similarities[order]
+
+    def exact_query(self, vector, k=10, exclude_id=None):
+        """Brute-force neighbours, for measuring the index's recall"""
+        vector = self._normalise(np.asarray(vector, dtype=np.float64))
+        similarities = self.vectors @ vector
+        if exclude_id is not None and exclude_id in self._id_position:
+            similarities[self._id_position[exclude_id]] = -np.inf
+        top = np.argsort(-similarities, kind='stable')[:k]
+        return self.ids[top], similarities[top]
+
+    def vector_for(self, student_id):
+        """Stored (normalised) vector of an indexed id, or None"""
+        position = self._id_position.get(student_id)
+        return None if position is None else self.vectors[position]
+
+    def latency_stats(self):
+        """Query latency percentiles in milliseconds over recent queries"""
+        if not self.query_times:
+            return {'queries': 0}
+        times = np.array(self.query_times) * 1000
+        return {
+            'queries': len(times),
+            'mean_ms': float(times.mean()),
+            'p50_ms': float(np.percentile(times, 50)),
+            'p95_ms': float(np.percentile(times, 95)),
+            'max_ms': float(times.max())
+        }
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+class RatingMatrix:
+    """
+    Sparse student x item score matrix for collaborative filtering.
+
+    Only observed scores are stored. A stored entry is an observed score, even
+    if that score is 0; a missing entry means the student has no result for
+    that item. Use observed_mask() or the CSR structure (indptr/indices) to
+    tell them apart, never matrix.nonzero().
+    """
+
+    def __init__(self, matrix, student_ids, items):
+        self.matrix = sparse.csr_matrix(matrix)
+        self.student_ids = np.asarray(student_ids)
+        self.items = np.asarray(items, dtype=object)
+
+        # Index maps from external ids to matrix positions
+        self.student_index = {sid: i for i, sid in enumerate(self.student_ids.tolist())}
+        self.item_index = {item: j for j, item in enumerate(self.items.tolist())}
+
+    @classmethod
+    def from_long(cls, student_ids, items, scores):
+        """Build from parallel arrays of (student_id, item, score) observations"""
+        student_ids = np.asarray(student_ids)
+        items = np.asarray(items, dtype=object)
+        scores = np.asarray(scores, dtype=np.float64)
+
+        unique_students, rows = np.unique(student_ids, return_inverse=True)
+        unique_items, cols = np.unique(items.astype(str), return_inverse=True)
+
+        # Construct via COO so explicit 0 scores are kept as stored entries
+        matrix = sparse.coo_matrix(
+            (scores, (rows, cols)),
+            shape=(len(unique_students), len(unique_items))
+        ).tocsr()
+        matrix.sort_indices()
+        return cls(matrix, unique_students, unique_items)
+
+    @classmethod
+    def from_aggregates(cls, score_sums, score_counts):
+        """Build mean scores from (student_id, subject) indexed sums and counts"""
+        means = score_sums / score_counts
+        return cls.from_long(
+            means.index.get_level_values('student_id').to_numpy(),
+            means.index.get_level_values('subject').astype(str).to_numpy(),
+            means.to_numpy()
+        )
+
+    @property
+    def shape(self):
+        return self.matrix.shape
+
+    @property
+    def nnz(self):
+        """Number of observed entries"""
+        return self.matrix.nnz
+
+    def memory_bytes(self):
+        """Bytes held by the CSR arrays"""
+        m = self.matrix
+        return m.data.nbytes + m.indices.nbytes + m.indptr.nbytes
+
+    def observed_mask(self):
+        """CSR matrix with 1.0 at every observed entry, including 0 scores"""
+        m = self.matrix
+        return sparse.csr_matrix(
+            (np.ones_like(m.data), m.indices, m.indptr), shape=m.shape)
+
+    def observed_counts(self, axis=1):
+        """Number of observed entries per student (axis=1) or per item (axis=0)"""
+        if axis == 1:
+            return np.diff(self.matrix.indptr)
+        return np.bincount(self.matrix.indices, minlength=self.shape[1])
+
+    def row(self, student_id):
+        """Observed (items, scores) for one student"""
+        i = self.student_index[student_id]
+        start, end = self.matrix.indptr[i], self.matrix.indptr[i + 1]
+        return self.items[self.matrix.indices[start:end]], self.matrix.data[start:end]
+
+    def rows_for(self, student_ids):
+        """Row positions for the given student ids, in the given order"""
+        return np.array([self.student_index[sid] for sid in student_ids], dtype=np.int64)
+
+    def to_dense(self, fill_value=np.nan):
+        """Dense DataFrame with unobserved entries set to fill_value"""
+        m = self.matrix
+        dense = np.full(m.shape, fill_value, dtype=np.float64)
+        rows = np.repeat(np.arange(m.shape[0]), np.diff(m.indptr))
+        dense[rows, m.indices] = m.data
+        return pd.DataFrame(dense, index=pd.Index(self.student_ids, name='student_id'),
+                            columns=pd.Index(self.items, name='subject'))
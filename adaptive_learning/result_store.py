@@ -0,0 +1,157 @@
+import sqlite3
+import pandas as pd
+
+# Raw results plus summary tables kept current by triggers, so reading the
+# student matrix never has to scan every test result.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    student_id INTEGER NOT NULL,
+    subject TEXT NOT NULL,
+    test_number INTEGER NOT NULL,
+    score REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_student ON results (student_id, subject);
+
+CREATE TABLE IF NOT EXISTS subject_aggregates (
+    student_id INTEGER NOT NULL,
+    subject TEXT NOT NULL,
+    score_sum REAL NOT NULL,
+    score_count INTEGER NOT NULL,
+    PRIMARY KEY (student_id, subject)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS student_time (
+    student_id INTEGER PRIMARY KEY,
+    test_number_sum INTEGER NOT NULL
+);
+
+CREATE TRIGGER IF NOT EXISTS results_after_insert AFTER INSERT ON results
+BEGIN
+    INSERT INTO subject_aggregates (student_id, subject, score_sum, score_count)
+    VALUES (NEW.student_id, NEW.subject, NEW.score, 1)
+    ON CONFLICT (student_id, subject) DO UPDATE SET
+        score_sum = score_sum + excluded.score_sum,
+        score_count = score_count + 1;
+    INSERT INTO student_time (student_id, test_number_sum)
+    VALUES (NEW.student_id, NEW.test_number)
+    ON CONFLICT (student_id) DO UPDATE SET
+        test_number_sum = test_number_sum + excluded.test_number_sum;
+END;
+
+CREATE TRIGGER IF NOT EXISTS results_after_delete AFTER DELETE ON results
+BEGIN
+    UPDATE subject_aggregates
+    SET score_sum = score_sum - OLD.score, score_count = score_count - 1
+    WHERE student_id = OLD.student_id AND subject = OLD.subject;
+    DELETE FROM subject_aggregates
+    WHERE student_id = OLD.student_id AND subject = OLD.subject AND score_count <= 0;
+    UPDATE student_time SET test_number_sum = test_number_sum - OLD.test_number
+    WHERE student_id = OLD.student_id;
+    DELETE FROM student_time
+    WHERE student_id = OLD.student_id
+      AND NOT EXISTS (SELECT 1 FROM subject_aggregates WHERE student_id = OLD.student_id);
+END;
+
+-- An edited result is taken back out of the summaries as OLD and put in again as NEW
+CREATE TRIGGER IF NOT EXISTS results_after_update AFTER UPDATE ON results
+BEGIN
+    UPDATE subject_aggregates
+    SET score_sum = score_sum - OLD.score, score_count = score_count - 1
+    WHERE student_id = OLD.student_id AND subject = OLD.subject;
+    DELETE FROM subject_aggregates
+    WHERE student_id = OLD.student_id AND subject = OLD.subject AND score_count <= 0;
+    UPDATE student_time SET test_number_sum = test_number_sum - OLD.test_number
+    WHERE student_id = OLD.student_id;
+    DELETE FROM student_time
+    WHERE student_id = OLD.student_id
+      AND NOT EXISTS (SELECT 1 FROM subject_aggregates WHERE student_id = OLD.student_id);
+    INSERT INTO subject_aggregates (student_id, subject, score_sum, score_count)
+    VALUES (NEW.student_id, NEW.subject, NEW.score, 1)
+    ON CONFLICT (student_id, subject) DO UPDATE SET
+        score_sum = score_sum + excluded.score_sum,
+        score_count = score_count + 1;
+    INSERT INTO student_time (student_id, test_number_sum)
+    VALUES (NEW.student_id, NEW.test_number)
+    ON CONFLICT (student_id) DO UPDATE SET
+        test_number_sum = test_number_sum + excluded.test_number_sum;
+END;
+"""
+
+
+class ResultStore:
+    """
+    SQLite-backed store of cleaned test results.
+
+    Raw rows live in an indexed results table; per-(student, subject) score
+    sums/counts and per-student test_number sums are maintained by triggers,
+    so the student matrix can be rebuilt from the summary tables alone.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def count(self):
+        """Number of stored test results"""
+        return self.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def insert_results(self, df):
+        """Append cleaned (student_id, subject, test_number, score) rows in one transaction"""
+        with self.conn:
+            self._insert_rows(df)
+        return len(df)
+
+    def import_results(self, frames):
+        """Append every frame of an iterable in a single transaction; all or nothing"""
+        n_rows = 0
+        with self.conn:
+            for df in frames:
+                self._insert_rows(df)
+                n_rows += len(df)
+        return n_rows
+
+    def _insert_rows(self, df):
+        rows = zip(df['student_id'].astype('int64').tolist(),
+                   df['subject'].astype(str).tolist(),
+                   df['test_number'].astype('int64').tolist(),
+                   df['score'].astype(float).tolist())
+        self.conn.executemany(
+            "INSERT INTO results (student_id, subject, test_number, score) "
+            "VALUES (?, ?, ?, ?)", rows)
+
+    def read_results(self, student_id=None):
+        """Raw results, optionally for one student (served by the student index)"""
+        query = "SELECT student_id, subject, test_number, score FROM results"
+        params = ()
+        if student_id is not None:
+            query += " WHERE student_id = ?"
+            params = (int(student_id),)
+        return pd.read_sql_query(query, self.conn, params=params)
+
+    def aggregates(self, student_ids=None):
+        """(score_sums, score_counts, test_number_sums) as DataProcessor stores them"""
+        where = ""
+        params = ()
+        if student_ids is not None:
+            student_ids = [int(s) for s in student_ids]
+            where = f" WHERE student_id IN ({','.join('?' * len(student_ids))})"
+            params = tuple(student_ids)
+
+        subjects = pd.read_sql_query(
+            "SELECT student_id, subject, score_sum, score_count FROM subject_aggregates"
+            + where + " ORDER BY student_id, subject", self.conn, params=params)
+        subjects = subjects.set_index(['student_id', 'subject'])
+
+        time_spent = pd.read_sql_query(
+            "SELECT student_id, test_number_sum FROM student_time"
+            + where + " ORDER BY student_id", self.conn, params=params)
+        time_spent = time_spent.set_index('student_id')['test_number_sum']
+
+        # Name the series like the in-memory groupby results
+        return (subjects['score_sum'].rename('score'), subjects['score_count'].rename('score'),
+                time_spent.rename('test_number'))
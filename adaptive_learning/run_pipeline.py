@@ -2,7 +2,7 @@ import os
 import sys
 import pandas as pd
 import numpy as np
-from data_processor import DataProcessor
+from data_context import DataContext
 from model_trainer import ModelTrainer
 from visualizer import Visualizer
 
@@ -22,23 +22,30 @@ def main():
     
     try:
         print("\nStarting Data Processing...")
-        processor = DataProcessor(dataset_path)
-        df = processor.load_data()
+        # Load and preprocess once; every stage below reuses this context
+        context = DataContext(dataset_path)
+        df = context.df
         print(f"Loaded {len(df)} records from dataset")
-        processed_data = processor.preprocess_data()
+        processed_data = context.processed_data
         print(f"Processed data shape: {processed_data.shape}")
+        # Workers and batch jobs open this with np.memmap instead of reloading the CSV
+        context.write_feature_store()
         
         print("\nStarting Model Training...")
-        trainer = ModelTrainer(dataset_path)
+        trainer = ModelTrainer(dataset_path, context=context)
         trainer.train_model()
+        trainer.score_recommendations()
         
         print("\nCreating Visualizations...")
-        visualizer = Visualizer(dataset_path)
+        visualizer = Visualizer(dataset_path, context=context)
         visualizer.create_all_visualizations()
+        print(f"\nDataset CSV parses this run: {context.csv_parses}")
         
         print("\nPipeline completed successfully!")
-        print("1. Trained model saved to 'models/performance_predictor.pkl'")
+        print("1. Trained model saved to 'models/performance_model.joblib'")
+        print("   Top-5 course modules per student saved to 'models/top_k_recommendations.npz'")
         print("2. Visualizations saved to 'visualizations/' directory")
+        print("   Student features saved to 'feature_store/' for memory-mapped reads")
         print("3. Run the Streamlit app using: streamlit run frontend/app.py")
     except Exception as e:
         print(f"Error during execution: {str(e)}")
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+def ratings_fingerprint(ratings):
+    """Short hash of a RatingMatrix's contents; changes whenever any score does"""
+    digest = hashlib.sha1()
+    m = ratings.matrix
+    # Fixed dtypes, so the same scores hash the same whichever path built the matrix
+    for array in (np.asarray(ratings.student_ids, dtype=np.int64), m.indptr.astype(np.int64),
+                  m.indices.astype(np.int64), m.data.astype(np.float64)):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    digest.update('\0'.join(map(str, ratings.items)).encode())
+    return digest.hexdigest()[:16]
+
+
+class SimilarityCache:
+    """
+    Two-tier cache of similarity rows keyed by student or item id.
+
+    A row is a numpy array or a tuple of arrays (e.g. neighbour ids and
+    similarities). Hot rows stay in an in-memory LRU bounded by
+    memory_budget_bytes; computed rows are also written to cache_dir so they
+    survive restarts and evictions, unless get() is told not to persist them.
+    The disk tier is bounded by disk_budget_bytes: past it, the least
+    recently used files (by mtime, which reads refresh) are deleted. All
+    entries belong to one version (see ratings_fingerprint); setting a new
+    version drops both tiers, since a changed score can move any similarity.
+    """
+
+    def __init__(self, cache_dir=None, memory_budget_bytes=64 * 1024 * 1024,
+                 disk_budget_bytes=256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.memory_budget_bytes = memory_budget_bytes
+        self.disk_budget_bytes = disk_budget_bytes
+        self.version = None
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        # Bytes in the disk tier; counted from the directory on first write
+        self._disk_bytes = None
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+
+    @staticmethod
+    def _nbytes(row):
+        return sum(part.nbytes for part in row) if isinstance(row, tuple) else row.nbytes
+
+    def _row_path(self, key):
+        return os.path.join(self.cache_dir, 'rows', f"{key}.npz")
+
+    def set_version(self, version):
+        """Tie the cache to a ratings version; a different version invalidates everything"""
+        with self._lock:
+            if version == self.version:
+                return
+            stored = None
+            version_path = None
+            if self.cache_dir is not None:
+                version_path = os.path.join(self.cache_dir, 'version.json')
+                if os.path.exists(version_path):
+                    with open(version_path) as f:
+                        stored = json.load(f).get('version')
+            if stored != version:
+                self._clear()
+                if version_path is not None:
+                    os.makedirs(self.cache_dir, exist_ok=True)
+                    with open(version_path, 'w') as f:
+                        json.dump({'version': version}, f)
+            else:
+                # Same version on disk (e.g. after a restart): keep the disk tier
+                self._memory.clear()
+                self._memory_bytes = 0
+            self.version = version
+
+    def invalidate(self, keys=None):
+        """Drop the given keys, or every entry when keys is None"""
+        with self._lock:
+            if keys is None:
+                self._clear()
+                return
+            for key in keys:
+                row = self._memory.pop(key, None)
+                if row is not None:
+                    self._memory_bytes -= self._nbytes(row)
+                if self.cache_dir is not None and os.path.exists(self._row_path(key)):
+                    os.remove(self._row_path(key))
+                    self._disk_bytes = None
+
+    def _clear(self):
+        self._memory.clear()
+        self._memory_bytes = 0
+        if self.cache_dir is not None:
+            shutil.rmtree(os.path.join(self.cache_dir, 'rows'), ignore_errors=True)
+        self._disk_bytes = None
+
+    def get(self, key, compute, persist=True):
+        """Cached row for key, calling compute() and caching its result on a miss
+
+        With persist=False a computed row is kept in the memory tier only,
+        for one-off keys not worth a file.
+        """
+        with self._lock:
+            row = self._memory.get(key)
+            if row is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return row
+            row = self._read_disk(key)
+            if row is not None:
+                self.disk_hits += 1
+                self._remember(key, row)
+                return row
+            self.misses += 1
+
+        row = compute()
+        with self._lock:
+            if persist:
+                self._write_disk(key, row)
+            self._remember(key, row)
+        return row
+
+    def _remember(self, key, row):
+        size = self._nbytes(row)
+        if size > self.memory_budget_bytes:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= self._nbytes(previous)
+        self._memory[key] = row
+        self._memory_bytes += size
+        while self._memory_bytes > self.memory_budget_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= self._nbytes(evicted)
+            self.evictions += 1
+
+    def _read_disk(self, key):
+        if self.cache_dir is None or not os.path.exists(self._row_path(key)):
+            return None
+        path = self._row_path(key)
+        try:
+            with np.load(path, allow_pickle=False) as stored:
+                parts = [stored[f"arr_{i}"] for i in range(len(stored.files))]
+            # Mark it recently used for disk eviction
+            os.utime(path)
+        except FileNotFoundError:
+            # Evicted by another process since the exists() check
+            return None
+        return tuple(parts) if len(parts) > 1 else parts[0]
+
+    def _write_disk(self, key, row):
+        if self.cache_dir is None:
+            return
+        path = self._row_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so a reader never sees a partial row
+        tmp_path = path[:-len('.npz')] + '.tmp.npz'
+        np.savez(tmp_path, *(row if isinstance(row, tuple) else (row,)))
+        if self._disk_bytes is None:
+            self._disk_bytes = sum(size for _, size, _ in self._disk_rows())
+        elif os.path.exists(path):
+            self._disk_bytes -= os.path.getsize(path)
+        os.replace(tmp_path, path)
+        self._disk_bytes += os.path.getsize(path)
+        if self._disk_bytes > self.disk_budget_bytes:
+            self._evict_disk()
+
+    def _disk_rows(self):
+        """(mtime, size, path) of every row file on disk"""
+        rows_dir = os.path.join(self.cache_dir, 'rows')
+        rows = []
+        with os.scandir(rows_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.npz') and not entry.name.endswith('.tmp.npz'):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    rows.append((stat.st_mtime, stat.st_size, entry.path))
+        return rows
+
+    def _evict_disk(self):
+        """Delete least recently used row files until the disk tier fits its budget"""
+        rows = sorted(self._disk_rows())
+        self._disk_bytes = sum(size for _, size, _ in rows)
+        for _, size, path in rows:
+            if self._disk_bytes <= self.disk_budget_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._disk_bytes -= size
+            self.disk_evictions += 1
+
+    def stats(self):
+        """Hit/miss counters and tier usage"""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'disk_evictions': self.disk_evictions,
+            'memory_rows': len(self._memory),
+            'memory_bytes': self._memory_bytes,
+            'disk_bytes': self._disk_bytes
+        }
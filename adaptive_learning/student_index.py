@@ -0,0 +1,50 @@
+import numpy as np
+
+
+class StudentIndex:
+    """
+    Read-only per-student lookup over a snapshot of processed_data.
+
+    Student ids are kept in a sorted array and resolved with a binary search,
+    and the numeric columns live in one contiguous float array, so fetching a
+    row costs a few microseconds instead of a pandas .loc plus to_dict.
+    The snapshot records the processor's data_version it was built from, so
+    callers can tell when it has gone stale.
+    """
+
+    def __init__(self, processed_data, version=None):
+        self.version = version
+        data = processed_data.sort_index()
+
+        self.student_ids = data.index.to_numpy()
+        self.numeric_columns = [col for col in data.columns if col != 'performance_tier']
+        self.values = np.ascontiguousarray(data[self.numeric_columns].to_numpy(dtype=np.float64))
+        self.tiers = data['performance_tier'].astype(object).to_numpy()
+        # time_spent is integral in processed_data; hand it back as an int
+        self._int_columns = {col for col in self.numeric_columns
+                             if np.issubdtype(data[col].dtype, np.integer)}
+
+    def __len__(self):
+        return len(self.student_ids)
+
+    def __contains__(self, student_id):
+        return self.position(student_id) is not None
+
+    def position(self, student_id):
+        """Row position of student_id, or None if absent"""
+        i = int(np.searchsorted(self.student_ids, student_id))
+        if i < len(self.student_ids) and self.student_ids[i] == student_id:
+            return i
+        return None
+
+    def get(self, student_id):
+        """One student's row as a dict shaped like processed_data.loc[id].to_dict()"""
+        i = self.position(student_id)
+        if i is None:
+            return None
+
+        row = {}
+        for col, value in zip(self.numeric_columns, self.values[i].tolist()):
+            row[col] = int(value) if col in self._int_columns else value
+        row['performance_tier'] = self.tiers[i]
+        return row
@@ -0,0 +1,33 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+# The pipeline modules import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SUBJECTS = ['Coding', 'Math', 'Social Studies']
+
+
+def make_export(n_students=60, n_tests=3, seed=0, first_id=1000):
+    """Rows shaped like the raw export, 'Average' summary rows included"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for student_id in range(first_id, first_id + n_students):
+        # Every fifth student has no Social Studies results
+        subjects = SUBJECTS[:2] if student_id % 5 == 0 else SUBJECTS
+        for subject in subjects:
+            scores = rng.integers(0, 101, n_tests)
+            for test_number, score in enumerate(scores, 1):
+                rows.append([student_id, subject, str(test_number), int(score), 'Math', 50])
+            rows.append([student_id, subject, 'Average', int(scores.mean()), 'Math', 50])
+    return pd.DataFrame(rows, columns=['student_id', 'subject', 'test_number', 'score',
+                                       'best_subject', 'average_score'])
+
+
+@pytest.fixture
+def export_csv(tmp_path):
+    path = tmp_path / 'results.csv'
+    make_export().to_csv(path, index=False)
+    return str(path)
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from data_processor import DataProcessor
+from evaluation import RecommenderEvaluator, ranking_metrics
+
+
+def looped_metrics(predictions, test_scores, k, relevance_threshold):
+    """ranking_metrics one student at a time, straight from the definitions"""
+    totals = {'precision': 0.0, 'recall': 0.0, 'ndcg': 0.0, 'students': 0}
+    for predicted, held_out in zip(predictions, test_scores):
+        items = [j for j in range(len(held_out)) if not np.isnan(held_out[j])]
+        relevant = {j for j in items if held_out[j] < relevance_threshold}
+        if not relevant:
+            continue
+        ranked = sorted(items, key=lambda j: predicted[j])[:k]
+        hits = [j in relevant for j in ranked]
+        dcg = sum(1 / np.log2(rank + 2) for rank, hit in enumerate(hits) if hit)
+        ideal = sum(1 / np.log2(rank + 2) for rank in range(min(len(relevant), k)))
+        totals['precision'] += sum(hits) / k
+        totals['recall'] += sum(hits) / len(relevant)
+        totals['ndcg'] += dcg / ideal
+        totals['students'] += 1
+    return totals
+
+
+@pytest.mark.parametrize('k', [1, 2, 3])
+def test_ranking_metrics_match_per_student_loop(k):
+    rng = np.random.default_rng(0)
+    predictions = rng.uniform(0, 100, size=(200, 4))
+    test_scores = rng.uniform(0, 100, size=(200, 4))
+    # Students with partial holdouts, none, or nothing relevant
+    test_scores[rng.random(test_scores.shape) < 0.3] = np.nan
+    test_scores[:10] = np.nan
+    test_scores[10:20] = 90
+
+    vectorised = ranking_metrics(predictions, test_scores, k=k, relevance_threshold=60)
+    looped = looped_metrics(predictions, test_scores, k=k, relevance_threshold=60)
+    assert vectorised['students'] == looped['students']
+    for name in ['precision', 'recall', 'ndcg']:
+        assert vectorised[name] == pytest.approx(looped[name])
+
+
+def test_evaluator_rejects_k_covering_every_item(export_csv):
+    df = DataProcessor(export_csv, use_cache=False).load_data()
+    assert RecommenderEvaluator(df).k == 2
+    with pytest.raises(ValueError):
+        RecommenderEvaluator(df, k=3)
@@ -0,0 +1,42 @@
+import numpy as np
+from knn_graph import build_knn_graph, _normalise, _top_k_block
+
+
+def brute_force(vectors, k):
+    """Every row's k most cosine-similar other rows, from the full N x N matrix"""
+    unit = _normalise(vectors)
+    similarities = unit @ unit.T
+    np.fill_diagonal(similarities, -np.inf)
+    order = np.argsort(-similarities, axis=1, kind='stable')[:, :k]
+    return order, np.take_along_axis(similarities, order, axis=1)
+
+
+def random_vectors(n=300, dim=6, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, dim))
+
+
+def test_build_knn_graph_matches_brute_force(tmp_path):
+    vectors = random_vectors()
+    ids = np.arange(5000, 5000 + len(vectors))
+    k = 10
+    # A small budget forces many row blocks, spread over two workers
+    graph = build_knn_graph(vectors, ids, str(tmp_path / 'knn.npz'), k=k,
+                            max_memory_bytes=200_000, n_jobs=2)
+    expected, similarities = brute_force(vectors, k)
+
+    for i in range(len(vectors)):
+        neighbour_ids, neighbour_similarities = graph.neighbours(ids[i])
+        np.testing.assert_array_equal(neighbour_ids, ids[expected[i]])
+        np.testing.assert_allclose(neighbour_similarities, similarities[i], rtol=1e-6)
+    assert len(graph.neighbours(ids[0], k=3)[0]) == 3
+
+
+def test_column_tiles_match_brute_force():
+    vectors = _normalise(random_vectors(n=120))
+    k = 5
+    expected, similarities = brute_force(vectors, k)
+    # Row blocks that straddle column tiles, and a final partial tile
+    for start, stop in [(0, 50), (50, 97), (97, 120)]:
+        positions, block_similarities = _top_k_block(vectors, start, stop, k, column_block=17)
+        np.testing.assert_array_equal(positions, expected[start:stop])
+        np.testing.assert_allclose(block_similarities, similarities[start:stop])
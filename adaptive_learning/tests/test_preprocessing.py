@@ -0,0 +1,106 @@
+import pytest
+import pandas as pd
+from data_processor import DataProcessor
+
+
+def in_memory(path):
+    return DataProcessor(path, use_cache=False).preprocess_data()
+
+
+def test_chunked_matches_in_memory(export_csv):
+    expected = in_memory(export_csv)
+    chunked = DataProcessor(export_csv, use_cache=False).preprocess_data(chunksize=50)
+    pd.testing.assert_frame_equal(chunked, expected)
+
+
+def new_results(rows):
+    return pd.DataFrame(rows, columns=['student_id', 'subject', 'test_number', 'score'])
+
+
+def recomputed(export_csv, updates, tmp_path):
+    raw = pd.read_csv(export_csv)
+    combined = pd.concat([raw, updates.assign(best_subject='Math', average_score=50)],
+                         ignore_index=True)
+    path = tmp_path / 'combined.csv'
+    combined.to_csv(path, index=False)
+    return in_memory(str(path))
+
+
+def test_update_scores_matches_full_recompute(export_csv, tmp_path):
+    updates = new_results([
+        [1001, 'Math', 4, 100],            # existing student and subject
+        [1005, 'Social Studies', 1, 80],   # existing student, subject they lacked
+        [5000, 'Coding', 1, 30],           # new student
+        [5000, 'Math', 1, 45],
+    ])
+    processor = DataProcessor(export_csv, use_cache=False)
+    processor.preprocess_data()
+    updated = processor.update_scores(updates)
+    pd.testing.assert_frame_equal(updated, recomputed(export_csv, updates, tmp_path))
+
+
+def test_update_scores_with_new_subject_matches_full_recompute(export_csv, tmp_path):
+    updates = new_results([[1002, 'Art', 1, 90]])
+    processor = DataProcessor(export_csv, use_cache=False)
+    processor.preprocess_data()
+    updated = processor.update_scores(updates)
+    pd.testing.assert_frame_equal(updated, recomputed(export_csv, updates, tmp_path))
+
+
+def test_sharded_matches_in_memory(export_csv):
+    expected = in_memory(export_csv)
+    sharded = DataProcessor(export_csv, use_cache=False).preprocess_data(n_jobs=3)
+    pd.testing.assert_frame_equal(sharded, expected)
+
+
+def test_result_store_matches_in_memory(export_csv, tmp_path):
+    expected = in_memory(export_csv)
+    stored = DataProcessor(export_csv, db_path=str(tmp_path / 'results.db')).preprocess_data()
+    pd.testing.assert_frame_equal(stored, expected)
+
+
+def test_result_store_triggers_track_updates_and_deletes(export_csv, tmp_path):
+    processor = DataProcessor(export_csv, db_path=str(tmp_path / 'results.db'))
+    conn = processor.get_result_store().conn
+    with conn:
+        conn.execute("UPDATE results SET score = score / 2, test_number = test_number + 1 "
+                     "WHERE id % 7 = 0")
+        conn.execute("UPDATE results SET student_id = 1001, subject = 'Art' WHERE id % 11 = 0")
+        conn.execute("DELETE FROM results WHERE id % 13 = 0")
+
+    aggregates = conn.execute(
+        "SELECT student_id, subject, score_sum, score_count FROM subject_aggregates "
+        "ORDER BY student_id, subject").fetchall()
+    recount = conn.execute(
+        "SELECT student_id, subject, SUM(score), COUNT(*) FROM results "
+        "GROUP BY student_id, subject ORDER BY student_id, subject").fetchall()
+    assert aggregates == recount
+
+    time_spent = conn.execute(
+        "SELECT student_id, test_number_sum FROM student_time ORDER BY student_id").fetchall()
+    retotal = conn.execute(
+        "SELECT student_id, SUM(test_number) FROM results GROUP BY student_id "
+        "ORDER BY student_id").fetchall()
+    assert time_spent == retotal
+
+
+def test_result_store_rejects_chunking_and_sharding(export_csv, tmp_path):
+    processor = DataProcessor(export_csv, db_path=str(tmp_path / 'results.db'))
+    with pytest.raises(ValueError):
+        processor.preprocess_data(chunksize=50)
+    with pytest.raises(ValueError):
+        processor.preprocess_data(n_jobs=2)
+
+
+def test_ingested_results_survive_a_reload(export_csv, tmp_path):
+    updates = new_results([[1001, 'Math', 4, 100], [5000, 'Coding', 1, 30]])
+    ingested = str(tmp_path / 'ingested' / 'results.csv')
+    processor = DataProcessor(export_csv, ingested_path=ingested)
+    processor.preprocess_data()
+    updated = processor.update_scores(updates)
+
+    reloaded = DataProcessor(export_csv, ingested_path=ingested).preprocess_data()
+    pd.testing.assert_frame_equal(reloaded, updated)
+    chunked = DataProcessor(export_csv, use_cache=False,
+                            ingested_path=ingested).preprocess_data(chunksize=50)
+    pd.testing.assert_frame_equal(chunked, updated)
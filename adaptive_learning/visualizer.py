@@ -3,14 +3,15 @@ import seaborn as sns
 import pandas as pd
 import numpy as np
 import os
-from data_processor import DataProcessor
+from data_context import DataContext
 
 class Visualizer:
-    def __init__(self, file_path):
+    def __init__(self, file_path, context=None):
         self.file_path = file_path
-        self.processor = DataProcessor(file_path)
-        self.df = self.processor.load_data()
-        self.processed_data = self.processor.preprocess_data()
+        self.context = context or DataContext.shared(file_path)
+        self.processor = self.context.processor
+        self.df = self.context.df
+        self.processed_data = self.context.processed_data
         
         # Create visualizations directory if it doesn't exist
         self.vis_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'visualizations')